@@ -0,0 +1,96 @@
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import requests
+import streamlit as st
+
+from utils import log
+
+ACTIVITY_LOGGER_URL = os.environ.get("ACTIVITY_LOGGER_URL", "http://localhost:6502")
+# Number of events waiting to be sent, further events are dropped while the activity logger is slow or down
+MAX_QUEUED_EVENTS = 1000
+# Number of events sent to the activity logger in one request
+BATCH_SIZE = 100
+# Seconds the background thread waits for further events before it sends a batch that is not full
+FLUSH_INTERVAL = 1.0
+# Seconds to wait for the activity logger, only the background thread waits for it
+TIMEOUT = 5
+
+
+class ActivityLogClient:
+    """
+    Client sending the events of the app (visitors, created graphs) to activity_logger.py without blocking the sessions.
+    Events are put into a bounded queue, which a background thread sends to the endpoint /log_batch in batches.
+    """
+
+    def __init__(self, url, max_queued_events, batch_size, flush_interval):
+        self.url = url
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped_events = 0
+        # Sessions count dropped events in their own threads, while the background thread reads and resets the count
+        self._dropped_events_lock = threading.Lock()
+        self._events = queue.Queue(maxsize=max_queued_events)
+        # The thread does not keep the app process alive, events still queued at its exit are lost
+        self._thread = threading.Thread(target=self._send_batches, name="ActivityLogClient", daemon=True)
+        self._thread.start()
+
+    def log_event(self, event, **params):
+        """
+        Queue an event to be sent to the activity logger. Never waits, the event is dropped if the queue is full.
+        :param event:   str, name of the event, either "visitor" or "graph_creation"
+        :param params:  the parameters of the event, e.g. the selected filters of a created graph
+        """
+        try:
+            self._events.put_nowait(
+                {"event": event, "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "params": params}
+            )
+        except queue.Full:
+            with self._dropped_events_lock:
+                self.dropped_events += 1
+
+    def _next_batch(self):
+        # Wait for the first event, then collect further ones until the batch is full or the flush interval passed
+        batch = [self._events.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._events.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _send_batches(self):
+        session = requests.Session()
+        while True:
+            batch = self._next_batch()
+            try:
+                session.post(f"{self.url}/log_batch", json={"events": batch}, timeout=TIMEOUT).raise_for_status()
+            except requests.exceptions.RequestException as e:
+                log(f"Error logging {len(batch)} events: {e}")
+            with self._dropped_events_lock:
+                dropped_events, self.dropped_events = self.dropped_events, 0
+            if dropped_events:
+                log(f"Dropped {dropped_events} events, because the activity logger did not keep up")
+
+
+@st.cache_resource(show_spinner=False)
+def get_activity_log_client():
+    """
+    Get the activity log client shared by all sessions of the app process.
+    :return:    ActivityLogClient
+    """
+    return ActivityLogClient(ACTIVITY_LOGGER_URL, MAX_QUEUED_EVENTS, BATCH_SIZE, FLUSH_INTERVAL)
+
+
+def log_event(event, **params):
+    """
+    Queue an event to be sent to the activity logger by the shared client, see ActivityLogClient.log_event().
+    """
+    get_activity_log_client().log_event(event, **params)
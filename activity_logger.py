@@ -7,65 +7,96 @@ from flask import Flask, request
 app = Flask(__name__)
 
 
-@app.route('/log_visitor', methods=['GET'])
-def log_visitor():
-    ip_address = request.remote_addr
-    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+VISITOR_FIELDNAMES = ['timestamp']
+GRAPH_CREATION_FIELDNAMES = [
+    'timestamp',
+    'research_areas',
+    'publication_types',
+    'venues',
+    'continents',
+    'countries',
+    'author_position',
+]
 
-    log_file = os.environ.get('LOG_FILE', 'visitors.csv')
 
+def write_rows(log_file, fieldnames, rows):
+    """
+    Append rows to a csv log file, and write the header first if the file is new.
+    :param log_file:    str, path to the csv file
+    :param fieldnames:  list of str, columns of the csv file
+    :param rows:        list of dicts, mapping the columns to their values
+    """
     with open(log_file, 'a', newline='') as csvfile:
-        fieldnames = ['timestamp']
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
 
         if csvfile.tell() == 0:
             writer.writeheader()
 
-        writer.writerow({
-            'timestamp': timestamp,
-        })
+        writer.writerows(rows)
+
+
+def graph_creation_row(timestamp, params):
+    """
+    Build the row of a created graph. Every filter is stored as a list, like the query parameters of a GET request.
+    :param timestamp:   str, time the graph was created
+    :param params:      dict, mapping the filters to their values
+    :return:            dict
+    """
+    row = {'timestamp': timestamp}
+    for fieldname in GRAPH_CREATION_FIELDNAMES[1:]:
+        value = params.get(fieldname, [])
+        row[fieldname] = value if isinstance(value, list) else [value]
+    return row
+
+
+@app.route('/log_visitor', methods=['GET'])
+def log_visitor():
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+    log_file = os.environ.get('LOG_FILE', 'visitors.csv')
+    write_rows(log_file, VISITOR_FIELDNAMES, [{'timestamp': timestamp}])
 
     return 'Logged visitor', 200
 
 @app.route('/log_graph_creation', methods=['GET'])
 def log_graph_creation():
-    # Get public ip address of the visitor
-    research_areas = request.args.getlist('research_areas')
-    publication_types = request.args.getlist('publication_types')
-    venues = request.args.getlist('venues')
-    continents = request.args.getlist('continents')
-    countries = request.args.getlist('countries')
-    author_position = request.args.getlist('author_position')
+    params = {fieldname: request.args.getlist(fieldname) for fieldname in GRAPH_CREATION_FIELDNAMES[1:]}
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
+
     log_file = os.environ.get('LOG_FILE_QUERIED_GRAPHS', 'queried_graphs.csv')
+    write_rows(log_file, GRAPH_CREATION_FIELDNAMES, [graph_creation_row(timestamp, params)])
 
-    with open(log_file, 'a', newline='') as csvfile:
-        fieldnames = [
-            'timestamp',
-            'research_areas',
-            'publication_types',
-            'venues',
-            'continents',
-            'countries',
-            'author_position',
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    return 'Logged query', 200
 
-        if csvfile.tell() == 0:
-            writer.writeheader()
 
-        writer.writerow({
-            'timestamp': timestamp,
-            'research_areas': research_areas,
-            'publication_types': publication_types,
-            'venues': venues,
-            'continents': continents,
-            'countries': countries,
-            'author_position': author_position,
-        })
+@app.route('/log_batch', methods=['POST'])
+def log_batch():
+    """
+    Log a batch of events sent by activity_log_client.py, as JSON of the form
+    {"events": [{"event": "visitor" or "graph_creation", "timestamp": str, "params": dict}, ...]}.
+    The events are written in the order they were sent, each csv file is opened once per batch.
+    """
+    events = request.get_json(silent=True)
+    if not isinstance(events, dict) or not isinstance(events.get('events'), list):
+        return 'Expected a JSON object with a list of events', 400
 
-    return 'Logged query', 200
+    visitors = []
+    graph_creations = []
+    for event in events['events']:
+        timestamp = event.get('timestamp') or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if event.get('event') == 'visitor':
+            visitors.append({'timestamp': timestamp})
+        elif event.get('event') == 'graph_creation':
+            graph_creations.append(graph_creation_row(timestamp, event.get('params') or {}))
+
+    if visitors:
+        write_rows(os.environ.get('LOG_FILE', 'visitors.csv'), VISITOR_FIELDNAMES, visitors)
+    if graph_creations:
+        write_rows(
+            os.environ.get('LOG_FILE_QUERIED_GRAPHS', 'queried_graphs.csv'), GRAPH_CREATION_FIELDNAMES, graph_creations
+        )
+
+    return f'Logged {len(visitors) + len(graph_creations)} events', 200
 
 
 if __name__ == '__main__':
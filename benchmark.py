@@ -0,0 +1,109 @@
+import os
+import tempfile
+import timeit
+from sqlite3 import connect
+from unittest import mock
+import pandas as pd
+import database
+from utils import log
+
+
+def benchmark_extract(size=100000, repeat=3):
+    """
+    Compare the row-wise _extract() with the batch _extract_all() on a series of dblp-like values, a mix of plain texts
+    and dict-encoded values with attributes, as they occur in the columns author and note of the parsed csv files.
+    :param size:    int, number of values in the series
+    :param repeat:  int, number of runs per implementation, the fastest one is reported
+    :return:        tuple of floats, the runtimes in seconds of _extract() and _extract_all()
+    """
+    templates = [
+        "Author {}",
+        "{{'orcid': '0000-0000-0000-{:04d}', 'text': 'Author {}'}}",
+        "{{'type': 'affiliation', 'text': 'University {}, Germany'}}",
+        "{{'type': 'affiliation', 'label': 'former', 'text': 'University {}, USA'}}",
+    ]
+    # Names repeat across publications, so every value occurs several times
+    values = pd.Series(
+        [templates[i % len(templates)].format(i % (size // 10), i % (size // 10)) for i in range(size)]
+    )
+    attributes = ["label", "type", "text"]
+
+    def row_wise():
+        return [values.apply(lambda x: database._extract(x, attribute)) for attribute in attributes]
+
+    def batch():
+        return database._extract_all(values, attributes)
+
+    # Both implementations have to return the same values
+    expected, actual = row_wise(), batch()
+    for attribute, column in zip(attributes, expected):
+        assert column.tolist() == actual[attribute].tolist(), f"Results differ for attribute {attribute}"
+
+    row_wise_time = min(timeit.repeat(row_wise, number=1, repeat=repeat))
+    batch_time = min(timeit.repeat(batch, number=1, repeat=repeat))
+    log(f"_extract():     {row_wise_time:.3f}s for {size} values and {len(attributes)} attributes")
+    log(f"_extract_all(): {batch_time:.3f}s for {size} values and {len(attributes)} attributes")
+    log(f"Speedup: {row_wise_time / batch_time:.1f}x")
+    return row_wise_time, batch_time
+
+
+def benchmark_fill_affiliations(size=50000, repeat=3):
+    """
+    Compare the runtime of fill_affiliations() with the former per-affiliation country code resolution, which scanned
+    COUNTRY_VARIATIONS with a boolean mask up to twice per affiliation, and with the batch resolution of
+    _assign_country_codes() on the lookup index COUNTRY_CODES.
+    :param size:    int, number of distinct affiliations
+    :param repeat:  int, number of runs per implementation, the fastest one is reported
+    :return:        tuple of floats, the runtimes in seconds before and after
+    """
+    countries = database.COUNTRY_VARIATIONS.Country.tolist()
+    affiliations = [
+        f"Institute {i}, City, {countries[i % len(countries)]}"
+        if i % 3
+        else f"Institute {i} {countries[i % len(countries)].split(' ')[-1]}"
+        for i in range(size)
+    ]
+
+    def read_country_code_by_scan(country):
+        return database.COUNTRY_VARIATIONS.loc[database.COUNTRY_VARIATIONS.Country == country, "Code"].values
+
+    def assign_country_codes_one_by_one(affiliations):
+        return pd.DataFrame(
+            [database._assign_country_code(affiliation) for affiliation in affiliations],
+            columns=["FullAffiliation", "CountryCode"],
+        )
+
+    with tempfile.TemporaryDirectory() as directory:
+        affiliations_path = os.path.join(directory, "affiliations.csv")
+        pd.DataFrame(affiliations, columns=["FullAffiliation"]).to_csv(affiliations_path, index=False)
+
+        def fill_affiliations():
+            conn = connect(":memory:")
+            database.fill_affiliations(conn, affiliations_path=affiliations_path)
+            return pd.read_sql("SELECT * FROM Affiliation", con=conn)
+
+        def fill_affiliations_before():
+            with mock.patch.object(database, "_read_country_code", read_country_code_by_scan), mock.patch.object(
+                database, "_assign_country_codes", assign_country_codes_one_by_one
+            ):
+                return fill_affiliations()
+
+        # Both implementations have to fill the same table
+        assert fill_affiliations_before().equals(fill_affiliations()), "Resulting affiliations differ"
+
+        before_time = min(timeit.repeat(fill_affiliations_before, number=1, repeat=repeat))
+        after_time = min(timeit.repeat(fill_affiliations, number=1, repeat=repeat))
+
+    log(f"fill_affiliations() before: {before_time:.3f}s for {size} affiliations")
+    log(f"fill_affiliations() after:  {after_time:.3f}s for {size} affiliations")
+    log(f"Speedup: {before_time / after_time:.1f}x")
+    return before_time, after_time
+
+
+def main():
+    benchmark_extract()
+    benchmark_fill_affiliations()
+
+
+if __name__ == "__main__":
+    main()
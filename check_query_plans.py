@@ -0,0 +1,123 @@
+import ast
+import itertools
+import os
+import sys
+from sqlite3 import connect
+
+import pandas as pd
+
+import graph_logic as gl
+from utils import log
+
+DB = "gap.db"
+QUERIED_GRAPHS_PATH = os.environ.get("LOG_FILE_QUERIED_GRAPHS", "queried_graphs.csv")
+# Tables that must not be scanned as a whole by the queries of populate_graph() in graph_logic.py
+LARGE_TABLES = ["AllTogether", "alto", "GenderCube"]
+FILTERS = ["venue", "research_area", "country", "cont", "publication_type"]
+
+
+def main():
+    conn = connect(DB)
+    combinations = filter_combinations(conn)
+    if os.path.exists(QUERIED_GRAPHS_PATH):
+        combinations += logged_filter_combinations(QUERIED_GRAPHS_PATH)
+
+    full_scans = check_query_plans(conn, combinations)
+    if full_scans:
+        sys.exit(1)
+
+
+def filter_combinations(conn):
+    """
+    Generate the combinations of filters the app offers: For each filter no value, one value, 'Unknown' (countries and
+    continents only) or two values of the database, combined with each author position.
+    :param conn:    sqlite3.Connection
+    :return:        list of dicts, mapping the parameters of populate_graph() in graph_logic.py to their values
+    """
+    def select_values(field_name):
+        _, table, name_column = gl.LOOKUP_TABLES[field_name]
+        sql = f"SELECT {name_column} FROM {table} WHERE {name_column} != 'Unknown' LIMIT 2;"
+        return [row[0] for row in conn.execute(sql)]
+
+    values = {
+        "venue": select_values("Venue"),
+        "research_area": select_values("ResearchArea"),
+        "country": select_values("Country"),
+        "cont": select_values("Continent"),
+        "publication_type": select_values("PublicationType"),
+    }
+    options = {}
+    for filter_name, selectable in values.items():
+        options[filter_name] = [[]] + [[value] for value in selectable]
+        if filter_name in {"country", "cont"}:
+            options[filter_name].append(["Unknown"])
+        if len(selectable) > 1:
+            options[filter_name].append(selectable)
+
+    return [
+        dict(zip(FILTERS, selection), author_position=author_position, min_publication_count=1)
+        for selection in itertools.product(*(options[filter_name] for filter_name in FILTERS))
+        for author_position in gl.AUTHOR_POSITION_FILTERS
+    ]
+
+
+def logged_filter_combinations(path):
+    """
+    Read the combinations of filters of the graphs logged by activity_logger.py and log how often each filter was used.
+    :param path:    str, path to the csv file of logged graphs
+    :return:        list of dicts, mapping the parameters of populate_graph() in graph_logic.py to their values
+    """
+    logged = pd.read_csv(path)
+    columns = {
+        "venues": "venue",
+        "research_areas": "research_area",
+        "countries": "country",
+        "continents": "cont",
+        "publication_types": "publication_type",
+    }
+    for column in list(columns) + ["author_position"]:
+        logged[column] = logged[column].apply(ast.literal_eval)
+    logged["author_position"] = logged["author_position"].str[0].fillna("")
+
+    log(f"Number of logged graphs: {len(logged)}")
+    for column in columns:
+        log(
+            f"Logged graphs filtered by {column}: {(logged[column].str.len() > 0).mean():.1%}, "
+            f"by multiple {column}: {(logged[column].str.len() > 1).mean():.1%}"
+        )
+
+    logged = logged.rename(columns=columns)[FILTERS + ["author_position"]]
+    logged["min_publication_count"] = 1
+    return logged.to_dict("records")
+
+
+def check_query_plans(conn, combinations):
+    """
+    Build the query of populate_graph() in graph_logic.py for each combination of filters the same way the app does and
+    check with EXPLAIN QUERY PLAN whether it scans one of LARGE_TABLES as a whole instead of searching an index. Queries
+    of selected venues on GenderCube also have to search the index by the venues, otherwise they read all rows of the
+    selected country or continent.
+    :param conn:            sqlite3.Connection
+    :param combinations:    list of dicts, mapping the parameters of populate_graph() to their values
+    :return:                list of dicts, the combinations whose query scans a whole table or does not search by venue
+    """
+    full_scans = []
+    for combination in combinations:
+        # The same fallback as build_graph_query() in graph_logic.py
+        cube_query = gl.build_cube_query(**combination)
+        sql_query, params = cube_query or gl.build_query(**combination)
+        plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql_query, params)]
+        scans = [step for step in plan if any(step.startswith(f"SCAN {table}") for table in LARGE_TABLES)]
+        if cube_query and combination["venue"]:
+            searches = [step for step in plan if step.startswith("SEARCH GenderCube")]
+            scans += [step for step in searches if "VenueID=?" not in step]
+        if scans:
+            log(f"WARNING: full scan {scans} for filters {combination}")
+            full_scans.append(combination)
+
+    log(f"{len(combinations) - len(full_scans)} of {len(combinations)} filter combinations searched by index")
+    return full_scans
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from sqlite3 import connect
+
+import streamlit as st
+
+DB = "gap.db"
+# Number of connections shared by all sessions of the app, sessions wait for a free one if all are borrowed
+POOL_SIZE = os.cpu_count() or 4
+# Number of prepared statements each connection keeps for reuse. The queries of the app bind the selected filter values
+# as parameters, so all selections of the same shape share one statement
+CACHED_STATEMENTS = 512
+PRAGMAS = {
+    # Map the database file into memory, so that all connections share the pages cached by the operating system
+    "mmap_size": 2**30,
+    # Negative values are in KiB, i.e. 64 MB of page cache per connection
+    "cache_size": -65536,
+    "query_only": "ON",
+}
+
+
+class ConnectionPool:
+    """
+    Pool of read-only connections to the database. The database is opened as immutable, so it must not be changed by
+    database.py while the app is running. Restart the app after rebuilding the database.
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        # Connections that were used most recently are borrowed first, as their caches are warm
+        self._idle_connections = queue.LifoQueue()
+        self._free_slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        # Sessions run in different threads, but a connection is used by one session at a time only
+        connection = connect(
+            f"file:{self.path}?mode=ro&immutable=1",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=CACHED_STATEMENTS,
+        )
+        for pragma, value in PRAGMAS.items():
+            connection.execute(f"PRAGMA {pragma} = {value};")
+        return connection
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection from the pool and return it afterwards. New connections are opened on demand up to the
+        size of the pool.
+        :return:    sqlite3.Connection
+        """
+        with self._free_slots:
+            try:
+                connection = self._idle_connections.get_nowait()
+            except queue.Empty:
+                connection = self._connect()
+            try:
+                yield connection
+            finally:
+                self._idle_connections.put(connection)
+
+
+@st.cache_resource(show_spinner=False)
+def get_connection_pool():
+    """
+    Get the pool of connections shared by all sessions of the app process.
+    :return:    ConnectionPool
+    """
+    return ConnectionPool(DB, POOL_SIZE)
+
+
+@st.cache_resource(show_spinner=False)
+def get_build_date():
+    """
+    Get the date of the build of the database, which database.py stores in the table GeneralStatistics. It is read
+    once per process, as the database is opened as immutable and must not change while the app is running.
+    :return:    str
+    """
+    with borrow_connection() as connection:
+        return connection.execute("SELECT Value FROM GeneralStatistics WHERE Name = 'Date';").fetchone()[0]
+
+
+def borrow_connection():
+    """
+    Borrow a connection from the shared pool, to be used in a with statement.
+    :return:    context manager of a sqlite3.Connection
+    """
+    return get_connection_pool().connection()
@@ -1,8 +1,11 @@
 from lxml import etree
+import numpy as np
 import pandas as pd
 from sqlite3 import Connection, connect
 from utils import log
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 import os
 import ast
 import re
@@ -38,6 +41,8 @@ NA_VALUES = [
     "null",
 ]
 COUNTRY_VARIATIONS = pd.read_csv("general_data/country_name_variations.csv", keep_default_na=False, na_values=NA_VALUES)
+# Lookup index from each country name variation to all of its country codes
+COUNTRY_CODES = {country: codes.values for country, codes in COUNTRY_VARIATIONS.groupby("Country", sort=False).Code}
 COUNTRIES = pd.read_csv("general_data/countries_unique.csv", keep_default_na=False, na_values=NA_VALUES)
 CONTINENTS = pd.read_csv("general_data/continents.csv", keep_default_na=False, na_values=NA_VALUES)
 # The, Zu, De, Den, Der, Del, Ul, Al, Da, El, Des, Di, Ten, Ter, Van, Von, Zur, Du, Das, Le actually are first names
@@ -95,6 +100,40 @@ NO_MIDDLE_NAMES = [
     "ka",
     "t",
 ]
+# Conditions on AllTogether for each class of author positions the app filters by, see populate_graph() in
+# graph_logic.py
+POSITION_CLASSES = {
+    "First": "Position = 1",
+    "Middle": "Position > 1 AND Position < AuthorCount",
+    "Last": "Position = AuthorCount",
+    "Any": "1",
+}
+# Statistics of GeneralStatistics on the sizes of the tables, see fill_statistics()
+TABLE_STATISTICS = {
+    "PublicationCount": "SELECT COUNT(DISTINCT PublicationID) FROM Publication",
+    "AffiliationCount": "SELECT COUNT(DISTINCT AffiliationID) FROM Affiliation",
+    "VenueCount": "SELECT COUNT(DISTINCT VenueID) FROM Venue",
+    "PublicationAuthorCount": "SELECT COUNT(DBLPName) FROM PublicationAuthor",
+}
+# Statistics of GeneralStatistics on the number of authors matching a condition, see fill_statistics()
+AUTHOR_STATISTICS = {
+    "AuthorCount": "1",
+    "FemaleAuthorCount": "Author.Gender = 'woman'",
+    "MaleAuthorCount": "Author.Gender = 'man'",
+    "UnknownAuthorCount": "Author.Gender = 'unknown'",
+    "AuthorCountWithCountry": "Affiliation.CountryCode IS NOT NULL",
+    "AuthorCountWithoutCountry": "Affiliation.AffiliationID IS NOT NULL AND Affiliation.CountryCode IS NULL",
+}
+# Statistics of GeneralStatistics on the number of authors of each continent matching a condition, stored with the
+# continent as prefix of their names, see fill_statistics()
+CONTINENT_AUTHOR_STATISTICS = {
+    "FemaleAuthorCount": "Author.Gender = 'woman'",
+    "MaleAuthorCount": "Author.Gender = 'man'",
+    "UnknownAuthorCount": "Author.Gender = 'unknown'",
+}
+# Minimum number of publications of a venue of the graphs the app shows on the first visit, see prefill_graph() in
+# graph_logic.py. It is stored along with the graphs, so the app only uses them for this minimum
+DEFAULT_GRAPH_MIN_PUBLICATION_COUNT = 0
 
 
 def main():
@@ -108,9 +147,15 @@ def main():
     drop(conn, "GenderAPIResults")
     drop(conn, "Affiliation")
     drop(conn, "Country")
+    drop(conn, "Continent")
+    drop(conn, "Gender")
+    drop(conn, "PublicationType")
+    drop(conn, "ResearchArea")
     drop(conn, "AllTogether")
     drop(conn, "GeneralStatistics")
     drop(conn, "Filters")
+    drop(conn, "GenderCube")
+    drop(conn, "DefaultGraph")
 
     drop_index(conn, "all_together_index")
 
@@ -123,7 +168,8 @@ def main():
     fill_gender_api_results(conn)
     fill_authors(conn, to_csv=True)  # Internally triggers fill_author_names()
     venue = fill_venues(conn, to_csv=True)
-    fill_publications(conn, to_csv=True)  # Internally triggers fill_publication_author_relationships()
+    # Internally triggers fill_publication_author_relationships()
+    fill_publications(conn, to_csv=True, processes=os.cpu_count())
     count_publications_per_venue(conn)
 
     fill_all_together(conn)
@@ -132,8 +178,10 @@ def main():
     # Generate a csv file of first names with unknown gender that can be passed to the GenderAPI
     get_unknown_first_names(conn)
 
-    create_indices(conn)
     insert_research_areas(conn)
+    create_indices(conn)
+    fill_gender_cube(conn)
+    fill_default_graphs(conn)
 
     fill_statistics(conn)
     fill_filters(conn)
@@ -154,7 +202,7 @@ def enable_foreign_key_constraints(conn):
 def fill_countries(conn: Connection, to_csv=False):
     """
     Get list of countries with unique names and country codes from countries_unique.csv, add continents and save
-    everything to table 'Country' by using the given connection conn.
+    everything to table 'Country' by using the given connection conn. The continents are saved to table 'Continent'.
     :param conn:    sqlite3.Connection
     :param to_csv:  bool, whether to save the resulting table to csv/db/Country.csv, too.
     :return:
@@ -173,43 +221,86 @@ def fill_countries(conn: Connection, to_csv=False):
         """
         CREATE TABLE Country(
             CountryCode TEXT PRIMARY KEY NOT NULL,
+            CountryID INT NOT NULL UNIQUE,
             DisplayName TEXT NOT NULL,
             Continent TEXT NOT NULL
         );
     """
     )
 
-    Country.to_sql("Country", con=conn, if_exists="append", index=False)
+    Country.to_sql("Country", con=conn, if_exists="append", index_label="CountryID")
     log("Countries written to database")
 
+    fill_lookup_table(conn, "Continent", Country.Continent)
+
 
-def fill_affiliations(conn: Connection, to_csv=False):
+def fill_lookup_table(conn: Connection, table, names):
     """
-    Parse unique affiliations from dblp.xml, extract their country (usually given at the end of an affiliation string),
-    identify their country code and save everything to table 'Affiliation' by using the given connection conn.
+    Save the distinct names of a dimension of AllTogether, e.g. continents, to a lookup table with the columns
+    '<table>ID' and 'Name' by using the given connection conn. AllTogether refers to the names by their integer IDs.
     :param conn:    sqlite3.Connection
-    :param to_csv:  bool, whether to save the resulting table to csv/db/Affiliation.csv, too.
+    :param table:   string, the name of the lookup table, e.g. 'Continent'
+    :param names:   iterable of strings, the names in order of their IDs, duplicates and None are dropped
+    """
+    names = pd.DataFrame({"Name": pd.Series(list(names), dtype=object).dropna().drop_duplicates()})
+    names.reset_index(drop=True, inplace=True)
+
+    conn.execute(
+        f"""
+        CREATE TABLE {table}(
+            {table}ID INT NOT NULL PRIMARY KEY,
+            Name TEXT NOT NULL UNIQUE
+        );
+    """
+    )
+    names.to_sql(table, con=conn, if_exists="append", index_label=f"{table}ID")
+    log(f"{table} lookup table written to database")
+
+
+def fill_affiliations(
+    conn: Connection, to_csv=False, affiliations_path="csv/affiliations.csv", dblp_path="dblp/dblp.xml"
+):
+    """
+    Get unique affiliations from the csv file generated by dblp_parser.py in single-pass mode or, if it does not exist
+    or is older than dblp.xml, parse them from dblp.xml. Extract their country (usually given at the end of an
+    affiliation string), identify their country code and save everything to table 'Affiliation' by using the given
+    connection conn.
+    :param conn:                sqlite3.Connection
+    :param to_csv:              bool, whether to save the resulting table to csv/db/Affiliation.csv, too.
+    :param affiliations_path:   string, path to the csv file of unique affiliations generated by dblp_parser.py
+    :param dblp_path:           string, path to dblp.xml
     """
     log("Progress of filling affiliations started")
-    context = etree.iterparse(source="dblp/dblp.xml", dtd_validation=True, load_dtd=True)
 
-    # Extract affiliations from dblp xml
-    raw_affiliations = set()
-    for action, elem in context:
-        if elem.tag == "note" and elem.get("type") == "affiliation" and elem.text is not None:
-            # Remove leading and trailing spaces
-            raw_affiliations.add(elem.text.strip())
-        elem.clear()
-    log("Affiliations from dblp extracted")
+    # The csv file is outdated if dblp.xml was updated after the last run of dblp_parser.py in single-pass mode
+    use_csv = os.path.exists(affiliations_path)
+    if use_csv and os.path.exists(dblp_path) and os.path.getmtime(affiliations_path) < os.path.getmtime(dblp_path):
+        log(f"{affiliations_path} is older than {dblp_path}, affiliations are parsed from {dblp_path} instead")
+        use_csv = False
+
+    if use_csv:
+        # Affiliations were already collected by dblp_parser.py while parsing the level-1 elements
+        raw_affiliations = set(
+            pd.read_csv(affiliations_path, dtype=str, keep_default_na=False).FullAffiliation
+        )
+        log("Affiliations from csv read")
+    else:
+        context = etree.iterparse(source=dblp_path, dtd_validation=True, load_dtd=True)
+
+        # Extract affiliations from dblp xml
+        raw_affiliations = set()
+        for action, elem in context:
+            if elem.tag == "note" and elem.get("type") == "affiliation" and elem.text is not None:
+                # Remove leading and trailing spaces
+                raw_affiliations.add(elem.text.strip())
+            elem.clear()
+        log("Affiliations from dblp extracted")
 
     # Extract country from affiliations and find country code
-    affiliations = []
-    for affiliation in raw_affiliations:
-        affiliations.append(_assign_country_code(affiliation))
+    Affiliation = _assign_country_codes(raw_affiliations)
     log("Countries to affiliations added")
 
     # Save affiliations to database
-    Affiliation = pd.DataFrame(affiliations, columns=["FullAffiliation", "CountryCode"])
     Affiliation.sort_values("FullAffiliation", inplace=True, ignore_index=True)
 
     if to_csv:
@@ -294,7 +385,7 @@ def fill_gender_api_results(
 def fill_authors(conn: Connection, to_csv=False):
     """
     Extract persons from dblp's www entries with title 'Home Page' (See https://dblp.org/faq/1474690.html.)
-    Expect to find 'csv/www.csv', a csv file of www entries, generated by dblp_parser.py. Use first (full) name in
+    Expect to find 'csv/www.parquet' or 'csv/www.csv', a file of www entries, generated by dblp_parser.py. Use first (full) name in
     column author as DBLPName and triggers propagation of table AuthorName with the remaining full names in list. Pick
     first affiliation only for a person in case multiple ones are listed and not specified further (See
     _prepare_affiliations() for details). Extracts Orcid and GoogleScholar pages from column url and puts the remaining
@@ -305,20 +396,25 @@ def fill_authors(conn: Connection, to_csv=False):
     :param to_csv:              bool, whether to save the resulting table to csv/db/AuthorName.csv, too.
     """
     log("Progress of filling authors started")
-    www = pd.read_csv("csv/www.csv")
-
-    # Drop modification date, entries not referring to actual authors and title (turned useless)
-    www.drop(["mdate"], axis="columns", inplace=True)
+    # Parquet files keep the types and labels of notes and the types of urls in separate columns instead of dicts
+    structured = _is_structured("www")
+    columns = ["key", "publtype", "author", "title", "note", "url"]
+    if structured:
+        columns += ["note.type", "note.label", "url.type"]
+    www = _read_entity("www", columns=columns)
+
+    # Drop entries not referring to actual authors and title (turned useless)
     www = www[www.title.isin(["Home Page", "Home Page ", "Home Page\nHome Page"])]
     www.drop(["title"], axis="columns", inplace=True)
     www = www[www.author.notnull()]
 
     # Extract name dblp uses on a person's page and corresponding alternative names
-    www["DBLPName"], alternative_names = _separate_names(www.author)
+    www["DBLPName"], alternative_names = _separate_names(www.author, structured=structured)
 
     # Extract a person's first affiliation that is not specified further (See _prepare_affiliations() for details)
-    www["affiliation"] = _prepare_affiliations(www[["key", "note"]])
-    www.drop(columns=["note"], inplace=True)
+    note_columns = ["note", "note.type", "note.label"] if structured else ["note"]
+    www["affiliation"] = _prepare_affiliations(www[["key"] + note_columns])
+    www.drop(columns=note_columns, inplace=True)
 
     # Get AffiliationID from table Affiliation by mapping 'affiliation' with Affiliation.FullAffiliation
     Affiliation = pd.read_sql("SELECT AffiliationID, FullAffiliation FROM Affiliation", con=conn)
@@ -330,10 +426,11 @@ def fill_authors(conn: Connection, to_csv=False):
 
     # Get a person's web pages by extracting Orcid and GoogleScholar pages from the urls and fill column Homepages with
     # remaining urls separated by newlines
+    url_types = Author["url.type"] if structured else pd.Series(None, index=Author.index, dtype=object)
     Author["OrcidPage"], Author["GoogleScholarPage"], Author["Homepages"] = zip(
-        *Author.url.apply(lambda x: _prepare_urls(x))
+        *[_prepare_urls(urls, types) for urls, types in zip(Author.url, url_types)]
     )
-    Author.drop(columns=["url"], inplace=True)
+    Author.drop(columns=["url", "url.type"] if structured else ["url"], inplace=True)
     log("Web pages of authors extracted and added")
 
     # Determine genders
@@ -411,8 +508,8 @@ def fill_venues(conn: Connection, to_csv=False):
     :param to_csv:  bool, whether to save the resulting table to csv/db/Venue.csv, too.
     """
     log("Progress of filling venues started")
-    inproceedings = pd.read_csv("csv/inproceedings.csv", usecols=["booktitle"])
-    articles = pd.read_csv("csv/article.csv", usecols=["journal"])
+    inproceedings = _read_entity("inproceedings", columns=["booktitle"])
+    articles = _read_entity("article", columns=["journal"])
 
     # Extract conference's and workshop's names
     conferences = pd.DataFrame()
@@ -452,63 +549,78 @@ def fill_venues(conn: Connection, to_csv=False):
     return Venue
 
 
-def fill_publications(conn: Connection, to_csv=False):
+def fill_publications(conn: Connection, to_csv=False, processes=None):
     """
     Extract publications from dblp's inproceedings, article, proceedings, book, incollection, phdthesis and masterthesis
     entries. Expect to find 'csv/article.csv', 'csv/book.csv', csv/incollection.csv', 'csv/inproceedings.csv',
-    'csv/mastersthesis.csv', 'csv/phdthesis.csv' and csv/proceedings.csv', csv files generated by dblp_parser.py.
+    'csv/mastersthesis.csv', 'csv/phdthesis.csv' and csv/proceedings.csv', csv files generated by dblp_parser.py, or
+    parquet files of the same names instead.
     Use the entries dblp keys as 'PublicationID'. Use the title, pages and year to fill the corresponding columns. Use
     the entries' 'publtype' for column 'PublicationType' (empty for regular publications). Add a column 'Type'
     containing the entries' name (e.g. 'Article' or 'Inproceedings'). Use proceedings' and inproceedings' booktitle and
     article's journal as their venue and add a reference to the venue in column VenueID. Save everything to table
     'Publication' by using the given connection conn. Trigger propagation of table PublicationAuthor containing the
     m-to-n-relationship entries for the relationships between Publication and Author.
-    :param conn:    sqlite3.Connection
-    :param to_csv:  bool, whether to save the resulting table to csv/db/AuthorName.csv, too.
+    :param conn:        sqlite3.Connection
+    :param to_csv:      bool, whether to save the resulting table to csv/db/AuthorName.csv, too.
+    :param processes:   int, number of worker processes to find the authors of publications with, default: None
     """
     log("Progress of filling publications started")
     # Read all the needed csv files and prepare for publication extraction
-    inproceedings = pd.read_csv(
-        "csv/inproceedings.csv",
+    inproceedings = _read_entity(
+        "inproceedings",
         dtype={"year": int, "publtype": str, "pages": str},
-        usecols=["key", "title", "booktitle", "pages", "year", "publtype", "author"],
+        columns=["key", "title", "booktitle", "pages", "year", "publtype", "author"],
     )
-    articles = pd.read_csv(
-        "csv/article.csv",
-        usecols=["key", "title", "journal", "pages", "year", "publtype", "author"],
+    articles = _read_entity(
+        "article",
+        columns=["key", "title", "journal", "pages", "year", "publtype", "author"],
         dtype={"year": float, "publtype": str, "pages": str},
     )
     # Read column year as float due to NaN values and then convert it to int
     articles.year = articles.year.astype(pd.Int64Dtype())
-    proceedings = pd.read_csv(
-        "csv/proceedings.csv",
-        usecols=["key", "title", "booktitle", "year", "publtype", "editor"],
+    proceedings = _read_entity(
+        "proceedings",
+        columns=["key", "title", "booktitle", "year", "publtype", "editor"],
         dtype={"year": int, "publtype": str},
     )
-    books = pd.read_csv(
-        "csv/book.csv",
-        usecols=["key", "title", "year", "publtype", "author"],
+    books = _read_entity(
+        "book",
+        columns=["key", "title", "year", "publtype", "author"],
         dtype={"year": int, "publtype": str},
     )
-    incollections = pd.read_csv(
-        "csv/incollection.csv",
-        usecols=["key", "title", "pages", "year", "publtype", "author"],
+    incollections = _read_entity(
+        "incollection",
+        columns=["key", "title", "pages", "year", "publtype", "author"],
         dtype={"year": int, "publtype": str, "pages": str},
     )
-    phdtheses = pd.read_csv(
-        "csv/phdthesis.csv",
-        usecols=["key", "title", "pages", "year", "publtype", "author"],
+    phdtheses = _read_entity(
+        "phdthesis",
+        columns=["key", "title", "pages", "year", "publtype", "author"],
         dtype={"year": object, "publtype": str, "pages": str},
     )
     # Read column year as object due to multiple years separated by newlines, pick the maximum and convert to int
     phdtheses.year = phdtheses.year.apply(lambda x: max(x.split("\n"))).astype(pd.Int64Dtype())
 
-    mastertheses = pd.read_csv(
-        "csv/mastersthesis.csv",
-        usecols=["key", "title", "year", "author"],
+    mastertheses = _read_entity(
+        "mastersthesis",
+        columns=["key", "title", "year", "author"],
         dtype={"year": int},
     )
 
+    # Parquet files contain the plain texts of titles and authors without additional information given via dict. The
+    # files of the entities may be of different formats, e.g. after a partial re-run of dblp_parser.py
+    for entity, publications in {
+        "inproceedings": inproceedings,
+        "article": articles,
+        "proceedings": proceedings,
+        "book": books,
+        "incollection": incollections,
+        "phdthesis": phdtheses,
+        "mastersthesis": mastertheses,
+    }.items():
+        publications["Structured"] = _is_structured(entity)
+
     # Use different queries and request by Type as there are some journals and conferences with the same name
     Venue_conf = pd.read_sql("SELECT VenueID, Name FROM Venue where Type = 'Conference | Workshop'", con=conn)
     Venue_journal = pd.read_sql("SELECT VenueID, Name FROM Venue where Type = 'Journal'", con=conn)
@@ -620,12 +732,12 @@ def fill_publications(conn: Connection, to_csv=False):
             mastertheses,
         ]
     )
-    publications_with_authors = Publication[["PublicationID", "author"]]
+    publications_with_authors = Publication[["PublicationID", "author", "Structured"]]
     Publication["AuthorCount"] = Publication.author.apply(lambda x: len(x.split("\n")) if pd.notnull(x) else 0)
-    Publication.drop(columns=["author"], inplace=True)
 
     # Extract actual title if additional title information like bibtex are given via dict
-    Publication.Title = Publication.Title.apply(lambda x: _extract(x, "text"))
+    Publication.Title = _extract_texts(Publication.Title, Publication.Structured)
+    Publication.drop(columns=["author", "Structured"], inplace=True)
 
     if to_csv:
         Publication.to_csv("csv/db/Publication.csv", index=False)
@@ -648,7 +760,7 @@ def fill_publications(conn: Connection, to_csv=False):
     Publication.to_sql("Publication", con=conn, if_exists="append", index=False)
     log("Publications written to database")
 
-    fill_publication_author_relationships(publications_with_authors, conn=conn, to_csv=True)
+    fill_publication_author_relationships(publications_with_authors, conn=conn, to_csv=True, processes=processes)
 
 def count_publications_per_venue(conn):
     log("Progress of counting publications started")
@@ -656,14 +768,18 @@ def count_publications_per_venue(conn):
     
 
 
-def fill_publication_author_relationships(publications: pd.DataFrame, conn: Connection, to_csv=False):
+def fill_publication_author_relationships(publications: pd.DataFrame, conn: Connection, to_csv=False, processes=None):
     """
     Find for each author in the list of authors of a publication in publications.author the corresponding DBLPName. Add
     the position the author is listed in the list of authors of publication. Save everything to table
     'PublicationAuthor' by using the given connection conn.
-    :param publications:    pd.DataFrame, with columns 'PublicationID' and 'author'
+    :param publications:    pd.DataFrame, with columns 'PublicationID', 'author' and 'Structured', whether the authors
+                            of a publication are given as plain names without dicts (read from a parquet file)
     :param conn:            sqlite3.Connection
     :param to_csv:          bool, whether to save the resulting table to csv/db/PublicationAuthor.csv, too.
+    :param processes:       int, default: None. If greater than 1, the publications are sharded by ranges of their keys
+                            and the DBLPNames of each shard are found in a separate worker process. The result is the
+                            same as with a single process.
     """
     log("Progress of filling publication author relationships started")
 
@@ -671,18 +787,28 @@ def fill_publication_author_relationships(publications: pd.DataFrame, conn: Conn
     Author = pd.read_sql("SELECT DBLPName FROM Author", con=conn)
     AuthorName = pd.read_sql("SELECT DBLPName, FullName FROM AuthorName", con=conn)
 
-    publications = publications.copy()
-    # Create a row per author in column author and add their position in the author list
-    publications.author = publications.author.apply(lambda x: x.split("\n") if pd.notnull(x) else [])
-    publications["Position"] = publications.author.apply(lambda x: list(range(1, len(x) + 1)))
-    publications = publications.explode(["author", "Position"])
-    log("Positions in author lists added")
-    publications.author = publications.author.apply(lambda x: _extract(x, "text") if pd.notnull(x) else None)
-
-    # Find DBLPName for each author by joining with Author on DBLPName and with AuthorName on FullName
-    PublicationAuthor = publications.merge(Author, how="left", left_on="author", right_on="DBLPName")
-    PublicationAuthor = PublicationAuthor.merge(AuthorName, how="left", left_on="author", right_on="FullName")
-    PublicationAuthor["DBLPName"] = PublicationAuthor.DBLPName_x.fillna(PublicationAuthor.DBLPName_y)
+    if processes and processes > 1:
+        # Remember the original order of the publications to concatenate the shards deterministically
+        publications = publications.reset_index(drop=True)
+        publications["Order"] = publications.index
+        publications = publications.sort_values("PublicationID")
+        bounds = np.linspace(0, len(publications), processes + 1).astype(int)
+        shards = [publications.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+        log(f"Publications sharded into {processes} key ranges")
+
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            PublicationAuthor = pd.concat(
+                executor.map(
+                    _find_dblp_names,
+                    shards,
+                    repeat(Author),
+                    repeat(AuthorName),
+                )
+            )
+        PublicationAuthor = PublicationAuthor.sort_values("Order", kind="stable", ignore_index=True)
+        PublicationAuthor.drop(columns=["Order"], inplace=True)
+    else:
+        PublicationAuthor = _find_dblp_names(publications, Author, AuthorName)
     log("DBLPNames for publications found")
 
     PublicationAuthor.drop_duplicates(inplace=True)
@@ -694,7 +820,7 @@ def fill_publication_author_relationships(publications: pd.DataFrame, conn: Conn
         "dblp/publications_with_erroneously_duplicated_authors.csv", index=False
     )
     PublicationAuthor.drop_duplicates(subset=["PublicationID", "DBLPName"], inplace=True, keep="first")
-    PublicationAuthor.drop(columns=["DBLPName_x", "DBLPName_y", "FullName", "author"], inplace=True)
+    PublicationAuthor.drop(columns=["DBLPName_x", "DBLPName_y", "FullName", "author", "Structured"], inplace=True)
 
     if to_csv:
         PublicationAuthor.to_csv("csv/db/PublicationAuthor.csv", index=False)
@@ -717,6 +843,32 @@ def fill_publication_author_relationships(publications: pd.DataFrame, conn: Conn
     log("Publication author relationships written to database")
 
 
+def _find_dblp_names(publications, Author, AuthorName):
+    """
+    Create a row per author of each publication with their position in the list of authors and find their DBLPName.
+    Runs in a worker process for each shard of publications if fill_publication_author_relationships() is called with
+    multiple processes.
+    :param publications:    pd.DataFrame, with columns 'PublicationID', 'author' and 'Structured'
+    :param Author:          pd.DataFrame, with column 'DBLPName' from table 'Author'
+    :param AuthorName:      pd.DataFrame, with columns 'DBLPName' and 'FullName' from table 'AuthorName'
+    :return:                pd.DataFrame, with columns of publications, 'Position', 'DBLPName_x', 'DBLPName_y',
+                            'FullName' and the found 'DBLPName'
+    """
+    publications = publications.copy()
+    # Create a row per author in column author and add their position in the author list
+    publications.author = publications.author.apply(lambda x: x.split("\n") if pd.notnull(x) else [])
+    publications["Position"] = publications.author.apply(lambda x: list(range(1, len(x) + 1)))
+    publications = publications.explode(["author", "Position"])
+    log("Positions in author lists added")
+    publications.author = _extract_texts(publications.author, publications.Structured)
+
+    # Find DBLPName for each author by joining with Author on DBLPName and with AuthorName on FullName
+    PublicationAuthor = publications.merge(Author, how="left", left_on="author", right_on="DBLPName")
+    PublicationAuthor = PublicationAuthor.merge(AuthorName, how="left", left_on="author", right_on="FullName")
+    PublicationAuthor["DBLPName"] = PublicationAuthor.DBLPName_x.fillna(PublicationAuthor.DBLPName_y)
+    return PublicationAuthor
+
+
 def get_unknown_first_names(conn: Connection):
     unknown = pd.read_sql(
         """
@@ -734,39 +886,49 @@ def get_unknown_first_names(conn: Connection):
 
 def fill_all_together(conn: Connection):
     """
-    Prepare the table 'AllTogether' by using the given connection conn.
+    Prepare the table 'AllTogether' by using the given connection conn. Its dimensions are stored as integer IDs of the
+    tables 'Venue', 'Country' and the lookup tables 'PublicationType', 'Gender' and 'Continent' (see
+    fill_lookup_table()). The rows are sorted by continent, country and year, so that the rows of a continent or country
+    are read from adjacent pages (see create_indices()).
     :param conn:    sqlite3.Connection
     :param to_csv:  bool, whether to save the resulting table to csv/db/AllTogether.csv, too.
     """
     log("Progress of filling all together started")
+    fill_lookup_table(conn, "PublicationType", pd.read_sql("SELECT DISTINCT Type FROM Publication;", con=conn).Type)
+    fill_lookup_table(conn, "Gender", pd.read_sql("SELECT DISTINCT Gender FROM Author;", con=conn).Gender)
+
     conn.execute(
         """
         CREATE TABLE AllTogether(
             PublicationID TEXT, 
-            PublicationType TEXT, 
+            PublicationTypeID INT, 
             AuthorID TEXT, 
-            Venue TEXT, 
+            VenueID INT, 
             AffiliationID INT, 
-            Position TEXT, 
-            Gender TEXT, 
+            Position INT, 
+            GenderID INT, 
             Year INT, 
             AuthorCount INT, 
-            Country TEXT, 
-            Continent TEXT);
+            CountryID INT, 
+            ContinentID INT);
     """
     )
 
     conn.execute(
         """
         INSERT INTO AllTogether
-        SELECT Publication.PublicationID, Publication.Type, Author.AuthorID, Venue.Name, Author.AffiliationID, PublicationAuthor.Position, Author.Gender, Publication.Year, Publication.AuthorCount, Country.DisplayName, Country.Continent
+        SELECT Publication.PublicationID, PublicationType.PublicationTypeID, Author.AuthorID, Venue.VenueID, Author.AffiliationID, CAST(PublicationAuthor.Position AS INT), Gender.GenderID, Publication.Year, Publication.AuthorCount, Country.CountryID, Continent.ContinentID
         FROM Publication
 
         INNER JOIN PublicationAuthor ON PublicationAuthor.PublicationID = Publication.PublicationID
         INNER JOIN Author ON PublicationAuthor.DBLPName = Author.DBLPName
         INNER JOIN Venue ON Publication.VenueID = Venue.VenueID
+        INNER JOIN PublicationType ON Publication.Type = PublicationType.Name
+        LEFT JOIN Gender ON Author.Gender = Gender.Name
         LEFT JOIN Affiliation ON Author.AffiliationID = Affiliation.AffiliationID
-        LEFT JOIN Country ON Affiliation.CountryCode = Country.CountryCode;
+        LEFT JOIN Country ON Affiliation.CountryCode = Country.CountryCode
+        LEFT JOIN Continent ON Country.Continent = Continent.Name
+        ORDER BY Continent.ContinentID, Country.CountryID, Publication.Year;
     """
     )
     log("All together written to database")
@@ -802,17 +964,17 @@ def clean_up_venues(conn: Connection, Venue):
     conn.execute(
         """
         WITH venue_publications AS (
-        SELECT Venue, Year  AS publication_year
+        SELECT VenueID, Year  AS publication_year
         FROM AllTogether
         ),
         venues_to_keep AS (
-            SELECT Venue
+            SELECT VenueID
             FROM venue_publications
-            GROUP BY Venue
+            GROUP BY VenueID
             HAVING COUNT(DISTINCT publication_year) > 1
         )
         DELETE FROM Venue
-        WHERE Name NOT IN (SELECT Venue FROM venues_to_keep)
+        WHERE VenueID NOT IN (SELECT VenueID FROM venues_to_keep)
         """
     )
     log("unplotable venues removed")
@@ -821,189 +983,240 @@ def clean_up_venues(conn: Connection, Venue):
 
 
 def create_indices(conn: Connection):
-    log("Process of creating AllTogether index started")
-
-    conn.execute(
-        """CREATE INDEX all_together_index ON AllTogether(PublicationID, PublicationType, AuthorID, Venue, AffiliationID, Position, Gender, Year, AuthorCount, Country, Continent);"""
-    )
+    """
+    Create the indexes for the filters of populate_graph() in graph_logic.py. Each filter on AllTogether can be looked
+    up by an index starting with the filtered column, followed by Year to group the matching rows. As AllTogether is
+    sorted by continent and country (see fill_all_together()), the rows found for a continent or country are stored
+    next to each other. Run check_query_plans.py to confirm that the queries of the app do not scan whole tables.
+    :param conn:    sqlite3.Connection
+    """
+    log("Process of creating AllTogether indexes started")
+
+    conn.execute("CREATE INDEX all_together_continent_index ON AllTogether(ContinentID, CountryID, Year);")
+    conn.execute("CREATE INDEX all_together_country_index ON AllTogether(CountryID, Year);")
+    conn.execute("CREATE INDEX all_together_venue_index ON AllTogether(VenueID, Year);")
+    conn.execute("CREATE INDEX all_together_research_area_index ON AllTogether(ResearchAreaID, Year);")
+    conn.execute("CREATE INDEX venue_name_index ON Venue(Name, NumOfPublications);")
+    # Let the query planner choose between the indexes based on their selectivity
+    conn.execute("ANALYZE;")
+    conn.commit()
 
-    log("Index created")
+    log("Indexes created")
 
 
 def insert_research_areas(conn: Connection):
+    """
+    Assign the research areas from Research_area.csv to Venue by their venue names and aliases and to AllTogether by
+    the IDs of the lookup table 'ResearchArea'. The mapping of names and aliases to research areas is loaded into a
+    temporary table and applied with a single update per table. If a name or alias is listed for multiple research
+    areas, the last one listed in the csv file is used.
+    :param conn:    sqlite3.Connection
+    """
+    log("Process of inserting research areas started")
     research_areas = pd.read_csv("general_data/Research_area.csv")
     conn.execute(
         """
         ALTER TABLE AllTogether
-            ADD ResearchArea VARCHAR;"""
+            ADD ResearchAreaID INT;"""
     )
 
-    for i in range(len(research_areas)):
-        conference_name = (
-            research_areas["Research Area"][i],
-            research_areas["Venue"][i],
-        )
-        conference_aliases = [
-            (
-                research_areas["Research Area"][i],
-                research_areas["Alias(es)(; separated)"][i].split(";")[x],
-            )
-            for x in range(len(research_areas["Alias(es)(; separated)"][i].split(";")))
-        ]
-        conference_aliases.insert(0, conference_name)
-
-        for y in range(len(conference_aliases)):
-            sql = f"""
-            SELECT
-                CASE WHEN EXISTS(
-                    SELECT Venue
-                    FROM AllTogether
-                    WHERE Venue = ?
-                )
-                THEN 'True'
-                ELSE 'False'
-            END
-            """
-
-            result = conn.execute(sql, (conference_aliases[y][1].lstrip(),))
-            if result.fetchall()[0][0] == "True":
-                sql = f"""
-                    UPDATE AllTogether
-                    SET ResearchArea = ?
-                    WHERE Venue = ?
-                """
-                conn.execute(
-                    sql,
-                    (
-                        conference_aliases[y][0].lstrip(),
-                        conference_aliases[y][1].lstrip(),
-                    ),
-                )
-    conn.commit()
-
-
-def fill_statistics(conn: Connection):
-    log("Process of filling statistics started")
-    conn.execute("""CREATE TABLE GeneralStatistics(Name TEXT, Value TEXT);""")
+    # Create a row per venue name and alias of each research area
+    aliases = pd.DataFrame(
+        {
+            "Venue": (research_areas["Venue"] + ";" + research_areas["Alias(es)(; separated)"].fillna("")).str.split(";"),
+            "ResearchArea": research_areas["Research Area"],
+        }
+    ).explode("Venue")
+    aliases.Venue = aliases.Venue.str.lstrip()
+    aliases.ResearchArea = aliases.ResearchArea.str.lstrip()
+    aliases = aliases[aliases.Venue != ""].drop_duplicates(subset=["Venue"], keep="last")
+    fill_lookup_table(conn, "ResearchArea", research_areas["Research Area"].str.lstrip())
+
+    conn.execute("DROP TABLE IF EXISTS temp.ResearchAreaAlias;")
+    conn.execute("CREATE TEMP TABLE ResearchAreaAlias(Venue TEXT PRIMARY KEY, ResearchArea TEXT NOT NULL);")
+    conn.executemany(
+        "INSERT INTO ResearchAreaAlias(Venue, ResearchArea) VALUES(?, ?);",
+        aliases[["Venue", "ResearchArea"]].itertuples(index=False, name=None),
+    )
 
-    # Distinct publication count
-    returnVal = conn.execute("""SELECT count(distinct PublicationID) as count\nFROM Publication;""")
-    result = returnVal.fetchall()[0][0]
     conn.execute(
-        f"""INSERT INTO GeneralStatistics(Name, Value) VALUES('PublicationCount', ?);""",
-        (result,),
+        """
+        UPDATE Venue
+        SET ResearchArea = (
+            SELECT ResearchArea FROM ResearchAreaAlias WHERE ResearchAreaAlias.Venue = Venue.Name
+        )
+        WHERE Name IN (SELECT Venue FROM ResearchAreaAlias);
+        """
     )
+    # Venues removed by clean_up_venues() can not be selected in the app and keep no research area
+    conn.execute(
+        """
+        UPDATE AllTogether
+        SET ResearchAreaID = (
+            SELECT ResearchAreaID
+            FROM Venue
+            INNER JOIN ResearchArea ON Venue.ResearchArea = ResearchArea.Name
+            WHERE Venue.VenueID = AllTogether.VenueID
+        )
+        WHERE VenueID IN (SELECT VenueID FROM Venue WHERE ResearchArea IS NOT NULL);
+        """
+    )
+    conn.execute("DROP TABLE temp.ResearchAreaAlias;")
+    conn.commit()
+    log("Research areas inserted")
 
-    # Distinct author count
-    returnVal = conn.execute("""SELECT count(distinct AuthorID) as count\nFROM Author;""")
-    result = returnVal.fetchall()[0][0]
-    conn.execute("""INSERT INTO GeneralStatistics VALUES('AuthorCount', ?);""", (result,))
-
-    # Distinct affiliation count
-    returnVal = conn.execute("""SELECT count(distinct AffiliationID) as count\nFROM Affiliation;""")
-    result = returnVal.fetchall()[0][0]
-    conn.execute("""INSERT INTO GeneralStatistics VALUES('AffiliationCount', ?);""", (result,))
-
-    # Distinct venue count
-    returnVal = conn.execute("""SELECT count(distinct VenueID) as count\nFROM Venue;""")
-    result = returnVal.fetchall()[0][0]
-    conn.execute("""INSERT INTO GeneralStatistics VALUES('VenueCount', ?);""", (result,))
 
-    # Distinct publication author count
-    returnVal = conn.execute("""SELECT count(DBLPName) as count\nFROM PublicationAuthor;""")
-    result = returnVal.fetchall()[0][0]
+def fill_gender_cube(conn: Connection):
+    """
+    Pre-aggregate AllTogether into the table 'GenderCube' to answer the queries of populate_graph() in graph_logic.py
+    without scanning AllTogether. For each year, venue, publication type, research area and class of author positions
+    (see POSITION_CLASSES) it contains the number of distinct publications with at least one matching author who is a
+    woman, a man or of any gender. As the countries of a publication's authors may differ, these counts are not additive
+    over countries and continents. Therefore, they are stored per country (Continent is the country's continent), per
+    continent (Country is NULL) and for all authors (Country and Continent are NULL). Authors without a known country
+    are counted under the country and continent 'Unknown'. Venues are given by their VenueID, all other dimensions by
+    their names.
+    :param conn:    sqlite3.Connection
+    """
+    log("Process of filling gender cube started")
     conn.execute(
-        """INSERT INTO GeneralStatistics VALUES('PublicationAuthorCount', ?);""",
-        (result,),
+        """
+        CREATE TABLE GenderCube(
+            Year INT,
+            VenueID INT,
+            PublicationType TEXT,
+            ResearchArea TEXT,
+            Country TEXT,
+            Continent TEXT,
+            PositionClass TEXT NOT NULL,
+            WomanCount INT NOT NULL,
+            ManCount INT NOT NULL,
+            TotalCount INT NOT NULL
+        );
+    """
     )
 
-    # Distinct publication author count where gender is woman
-    returnVal = conn.execute("""SELECT count(distinct AuthorID) as count\n FROM Author where Gender = \"woman\"""")
-    result = returnVal.fetchall()[0][0]
-    conn.execute("""INSERT INTO GeneralStatistics VALUES('FemaleAuthorCount', ?)""", (result,))
+    levels = {
+        "country": ("IFNULL(Country.DisplayName, 'Unknown')", "IFNULL(Continent.Name, 'Unknown')"),
+        "continent": ("NULL", "IFNULL(Continent.Name, 'Unknown')"),
+        "all": ("NULL", "NULL"),
+    }
+    for position_class, position_condition in POSITION_CLASSES.items():
+        for country, continent in levels.values():
+            # Only venues that were not removed by clean_up_venues() can be selected in the app
+            conn.execute(
+                f"""
+                INSERT INTO GenderCube
+                SELECT
+                    Year,
+                    AllTogether.VenueID,
+                    PublicationType.Name,
+                    ResearchArea.Name,
+                    {country},
+                    {continent},
+                    '{position_class}',
+                    COUNT(DISTINCT CASE WHEN Gender.Name = 'woman' THEN PublicationID END),
+                    COUNT(DISTINCT CASE WHEN Gender.Name = 'man' THEN PublicationID END),
+                    COUNT(DISTINCT PublicationID)
+                FROM AllTogether
+                INNER JOIN Venue ON AllTogether.VenueID = Venue.VenueID
+                INNER JOIN PublicationType ON AllTogether.PublicationTypeID = PublicationType.PublicationTypeID
+                LEFT JOIN Gender ON AllTogether.GenderID = Gender.GenderID
+                LEFT JOIN ResearchArea ON AllTogether.ResearchAreaID = ResearchArea.ResearchAreaID
+                LEFT JOIN Country ON AllTogether.CountryID = Country.CountryID
+                LEFT JOIN Continent ON AllTogether.ContinentID = Continent.ContinentID
+                WHERE {position_condition}
+                GROUP BY Year, AllTogether.VenueID, PublicationType.Name, ResearchArea.Name, {country}, {continent};
+                """
+            )
+        log(f"Gender cube for position class {position_class} filled")
 
-    # Distinct publication author count where gender is man
-    returnVal = conn.execute("""SELECT count(distinct AuthorID) as count\n FROM Author where Gender = \"man\"""")
-    result = returnVal.fetchall()[0][0]
-    conn.execute("""INSERT INTO GeneralStatistics VALUES('MaleAuthorCount', ?)""", (result,))
+    # The selected venues are searched by the index as well, so that a selection of venues does not read all rows of a
+    # country or continent. Selections of a country without a continent are searched by the second index
+    conn.execute("CREATE INDEX gender_cube_index ON GenderCube(PositionClass, Continent, Country, VenueID);")
+    conn.execute("CREATE INDEX gender_cube_country_index ON GenderCube(PositionClass, Country, VenueID);")
+    conn.commit()
+    log("Gender cube written to database")
 
-    # Distinct publication author count where gender is unknown
-    returnVal = conn.execute("""SELECT count(distinct AuthorID) as count\n FROM Author where Gender = \"unknown\"""")
-    result = returnVal.fetchall()[0][0]
-    conn.execute("""INSERT INTO GeneralStatistics VALUES('UnknownAuthorCount', ?)""", (result,))
 
-    # Distinct author count where country is known
-    returnVal = conn.execute(
-        """SELECT count(distinct AuthorID) FROM Author INNER JOIN Affiliation ON Author.AffiliationID = Affiliation.AffiliationID WHERE Affiliation.CountryCode is not null;"""
-    )
-    result = returnVal.fetchall()[0][0]
+def fill_default_graphs(conn: Connection):
+    """
+    Materialize the graphs the app shows on the first visit of a session (see prefill_graph() in graph_logic.py) into the
+    table 'DefaultGraph': For each continent and year, the number of distinct publications whose first author is a woman
+    and their share of all publications in percent, over the venues with at least DEFAULT_GRAPH_MIN_PUBLICATION_COUNT
+    publications. The app loads them without querying AllTogether or GenderCube.
+    :param conn:    sqlite3.Connection
+    """
+    log("Process of filling default graphs started")
     conn.execute(
-        """INSERT INTO GeneralStatistics VALUES('AuthorCountWithCountry', ?)""",
-        (result,),
+        f"""
+        CREATE TABLE DefaultGraph AS
+        SELECT
+            Continent.Name AS Continent,
+            {DEFAULT_GRAPH_MIN_PUBLICATION_COUNT} AS MinPublicationCount,
+            Year,
+            COUNT(DISTINCT CASE WHEN Gender.Name = 'woman' THEN PublicationID END) AS Absolute,
+            COUNT(DISTINCT CASE WHEN Gender.Name = 'woman' THEN PublicationID END) * 100.0
+                / COUNT(DISTINCT PublicationID) AS Relative
+        FROM AllTogether
+        INNER JOIN Venue ON AllTogether.VenueID = Venue.VenueID
+        INNER JOIN Continent ON AllTogether.ContinentID = Continent.ContinentID
+        LEFT JOIN Gender ON AllTogether.GenderID = Gender.GenderID
+        WHERE {POSITION_CLASSES["First"]} AND Venue.NumOfPublications >= {DEFAULT_GRAPH_MIN_PUBLICATION_COUNT}
+        GROUP BY Continent.Name, Year
+        ORDER BY Continent.Name, Year;
+        """
     )
+    conn.commit()
+    log("Default graphs written to database")
 
-    # Distinct author count where country is unknown
-    returnVal = conn.execute(
-        """SELECT count(distinct AuthorID) FROM Author INNER JOIN Affiliation ON Author.AffiliationID = Affiliation.AffiliationID WHERE Affiliation.CountryCode is null;"""
-    )
-    result = returnVal.fetchall()[0][0]
-    conn.execute(
-        """INSERT INTO GeneralStatistics VALUES('AuthorCountWithoutCountry', ?)""",
-        (result,),
-    )
 
-    # Distinct female authors from each continent
-    returnVal = conn.execute(
-        """SELECT Country.Continent, count(distinct Author.AuthorID) as count\n 
-            FROM Author 
-            INNER JOIN Affiliation ON Author.AffiliationID = Affiliation.AffiliationID
-            INNER JOIN Country ON Affiliation.CountryCode = Country.CountryCode
-            WHERE Author.Gender = "woman"
-            GROUP BY Country.Continent""")
-
-    result = returnVal.fetchall()
-    for row in result:
-        continent, count = row
-        conn.execute(
-            """INSERT INTO GeneralStatistics VALUES('{}FemaleAuthorCount', ?)"""
-            .format(continent), (count, ))
-
-    # Distinct male authors from each continent
-    returnVal = conn.execute(
-        """SELECT Country.Continent, count(distinct Author.AuthorID) as count\n 
-            FROM Author 
-            INNER JOIN Affiliation ON Author.AffiliationID = Affiliation.AffiliationID
-            INNER JOIN Country ON Affiliation.CountryCode = Country.CountryCode
-            WHERE Author.Gender = "man"
-            GROUP BY Country.Continent""")
-    result = returnVal.fetchall()
-    for row in result:
-        continent, count = row
-        conn.execute(
-            """INSERT INTO GeneralStatistics VALUES('{}MaleAuthorCount', ?)""".
-            format(continent), (count, ))
-
-    # Distinct unknown gender authors from each continent
-    returnVal = conn.execute(
-        """SELECT Country.Continent, count(distinct Author.AuthorID) as count\n 
-            FROM Author 
-            INNER JOIN Affiliation ON Author.AffiliationID = Affiliation.AffiliationID
-            INNER JOIN Country ON Affiliation.CountryCode = Country.CountryCode
-            WHERE Author.Gender = "unknown"
-            GROUP BY Country.Continent""")
-    result = returnVal.fetchall()
-    for row in result:
-        continent, count = row
-        conn.execute(
-            """INSERT INTO GeneralStatistics VALUES('{}UnknownAuthorCount', ?)"""
-            .format(continent), (count, ))
+def fill_statistics(conn: Connection):
+    """
+    Fill the table 'GeneralStatistics' with the statistics shown by general_statistics.py. Instead of a query per
+    statistic, the sizes of the tables (see TABLE_STATISTICS) are queried at once and the author counts (see
+    AUTHOR_STATISTICS and CONTINENT_AUTHOR_STATISTICS) are computed by conditional aggregation in a single pass over the
+    authors grouped by continent. A new statistic is added by a new entry in one of them, without another pass.
+    :param conn:    sqlite3.Connection
+    """
+    log("Process of filling statistics started")
+    conn.execute("""CREATE TABLE GeneralStatistics(Name TEXT, Value TEXT);""")
 
+    # The sizes of the tables, in one query
+    sql = "SELECT {};".format(", ".join(f"({query})" for query in TABLE_STATISTICS.values()))
+    statistics = list(zip(TABLE_STATISTICS, conn.execute(sql).fetchone()))
+
+    # The author counts, in one pass over the authors and their affiliations. As the tables are joined along their
+    # primary keys, each author is counted in exactly one group, so the counts of all groups add up to the totals
+    conditions = list(AUTHOR_STATISTICS.values()) + list(CONTINENT_AUTHOR_STATISTICS.values())
+    groups = conn.execute(
+        f"""
+        SELECT
+            Country.CountryCode IS NOT NULL,
+            Country.Continent,
+            {", ".join(f"COUNT(CASE WHEN {condition} THEN 1 END)" for condition in conditions)}
+        FROM Author
+        LEFT JOIN Affiliation ON Author.AffiliationID = Affiliation.AffiliationID
+        LEFT JOIN Country ON Affiliation.CountryCode = Country.CountryCode
+        GROUP BY Country.CountryCode IS NOT NULL, Country.Continent;
+        """
+    ).fetchall()
+
+    totals = [sum(counts) for counts in zip(*(group[2 : 2 + len(AUTHOR_STATISTICS)] for group in groups))]
+    statistics += zip(AUTHOR_STATISTICS, totals or [0] * len(AUTHOR_STATISTICS))
+    # As before, the counts of continents are only stored if not 0
+    for has_country, continent, *counts in groups:
+        if has_country:
+            statistics += [
+                (f"{continent}{name}", count)
+                for name, count in zip(CONTINENT_AUTHOR_STATISTICS, counts[len(AUTHOR_STATISTICS) :])
+                if count
+            ]
 
     # Date of last updated database
-    conn.execute(
-        f"""INSERT INTO GeneralStatistics(Name, Value) VALUES('Date', ?)""",
-        (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),),
-    )
+    statistics.append(("Date", datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+
+    conn.executemany("""INSERT INTO GeneralStatistics(Name, Value) VALUES(?, ?);""", statistics)
     conn.commit()
 
     log("Process of filling statistics finished")
@@ -1015,34 +1228,64 @@ def fill_filters(conn: Connection):
         pathlib.Path("filters").mkdir(parents=True)
 
     returnPubType = pd.read_sql_query(
-        """SELECT distinct PublicationType\nFROM AllTogether;""",
+        """SELECT Name AS PublicationType\nFROM PublicationType
+        WHERE PublicationTypeID IN (SELECT PublicationTypeID FROM AllTogether);""",
         conn,
     )
 
     returnPubType.to_csv("filters/PublicationTypes.csv", index=False)
 
     returnVenue = pd.read_sql_query(
-        """SELECT distinct Name, NumOfPublications\nFROM Venue;""",
+        """SELECT distinct Name, NumOfPublications\nFROM Venue\nORDER BY VenueID;""",
         conn,
     )
 
     returnVenue.to_csv("filters/Venues.csv", index=False)
 
     returnContCount = pd.read_sql_query(
-        """SELECT distinct Country, Continent\nFROM AllTogether\nWHERE Country IS NOT NULL""",
+        """SELECT DisplayName AS Country, Continent\nFROM Country
+        WHERE CountryID IN (SELECT CountryID FROM AllTogether)""",
         conn,
     )
 
     returnContCount.to_csv("filters/Countries.csv", index=False)
 
     returnResAreas = pd.read_sql_query(
-        """SELECT distinct ResearchArea\nFROM AllTogether\nWHERE ResearchArea IS NOT NULL""",
+        """SELECT Name AS ResearchArea\nFROM ResearchArea
+        WHERE ResearchAreaID IN (SELECT ResearchAreaID FROM AllTogether)""",
         conn,
     )
 
     returnResAreas.to_csv("filters/ResearchAreas.csv", index=False)
 
 
+def _is_structured(entity):
+    """
+    Check whether dblp_parser.py generated a parquet file for the given entity, whose sub-elements are plain texts with
+    their attributes given in separate columns instead of dicts.
+    :param entity:  string, the name of a level-1 element of dblp.xml, e.g. 'article'
+    :return:        bool
+    """
+    return os.path.exists(f"csv/{entity}.parquet")
+
+
+def _read_entity(entity, columns=None, dtype=None):
+    """
+    Read the file of the given entity generated by dblp_parser.py. The parquet file is preferred over the csv file, as
+    it is read with column projection and without type inference.
+    :param entity:  string, the name of a level-1 element of dblp.xml, e.g. 'article'
+    :param columns: list of strings, the columns to read, default: None. If None, all columns are read.
+    :param dtype:   dict, mapping columns to their types, default: None
+    :return:        pd.DataFrame
+    """
+    if _is_structured(entity):
+        df = pd.read_parquet(f"csv/{entity}.parquet", columns=columns)
+        # All columns of the parquet files are stored as strings already
+        dtype = {column: type_ for column, type_ in (dtype or {}).items() if type_ is not str}
+        return df.astype(dtype) if dtype else df
+    return pd.read_csv(f"csv/{entity}.csv", usecols=columns, dtype=dtype)
+
+
 def _assign_country_code(affiliation):
     """
     Extract the country from the given affiliation by using the following rules of thumb:
@@ -1077,6 +1320,39 @@ def _assign_country_code(affiliation):
     return [affiliation, country_code]
 
 
+def _assign_country_codes(affiliations):
+    """
+    Batch version of _assign_country_code() for a whole collection of affiliations, following the same rules of thumb.
+    The potential countries of all affiliations are extracted at once and looked up in COUNTRY_CODES.
+    :param affiliations:    iterable of strings, containing the full affiliations listed in dblp
+    :return:                pd.DataFrame, with columns 'FullAffiliation' and 'CountryCode'. CountryCode is None if no or
+                            more than one country code was found.
+    """
+    affiliations = pd.Series(list(affiliations), dtype=object)
+    no_codes = np.array([], dtype=object)
+
+    def read_country_codes(potential_countries):
+        codes_found = potential_countries.map(lambda x: COUNTRY_CODES.get(x, no_codes))
+        # Log ambiguous matches the same way as _read_country_code()
+        for country, codes in zip(potential_countries[codes_found.str.len() > 1], codes_found[codes_found.str.len() > 1]):
+            log(f"WARNING: more than one country code is found for extracted country {country}: {codes}")
+        return codes_found.str.len(), codes_found.str[0]
+
+    # Most affiliations list the country after last comma
+    has_comma = affiliations.str.contains(",", regex=False)
+    comma_counts, comma_codes = read_country_codes(affiliations[has_comma].str.rsplit(",", n=1).str[-1].str.strip())
+    comma_counts = comma_counts.reindex(affiliations.index, fill_value=0)
+
+    # Some affiliations do not separate the information by comma but still contain the country as the last word
+    without_code = comma_counts == 0
+    word_counts, word_codes = read_country_codes(affiliations[without_code].str.rsplit(" ", n=1).str[-1].str.strip())
+
+    Affiliation = pd.DataFrame({"FullAffiliation": affiliations, "CountryCode": None})
+    Affiliation.loc[comma_codes[comma_counts[has_comma] == 1].index, "CountryCode"] = comma_codes
+    Affiliation.loc[word_codes[word_counts == 1].index, "CountryCode"] = word_codes
+    return Affiliation
+
+
 def _read_country_code(country):
     """
     Search for the given country in country_name_variations.csv and return the result(s).
@@ -1084,17 +1360,18 @@ def _read_country_code(country):
     :return:    string, one of ISO 3166-1 alpha-2 country codes or empty string if no match was found in
                 country_name_variations.csv
     """
-    codes = COUNTRY_VARIATIONS.loc[COUNTRY_VARIATIONS.Country == country, "Code"].values
+    codes = COUNTRY_CODES.get(country, np.array([], dtype=object))
     if len(codes) > 1:
         log(f"WARNING: more than one country code is found for extracted country {country}: {codes}")
     return codes
 
 
-def _separate_names(authors):
+def _separate_names(authors, structured=False):
     """
     Split an author's names into their DBLPName (first (full) name in a row of given series authors) and corresponding
     alternative names.
     :param authors:     pd.Series, containing all names of one person per row separated by newlines.
+    :param structured:  bool, whether the names are given as plain names without dicts (read from parquet files)
     :return:            tuple of    1. pd.Series, containing the DBLPNames with the same indices as given in authors and
                                     2. pd.DataFrame, with columns 'DBLPName' and 'FullName', each FullName is an
                                     alternative name of an author identifiable via their DBLPName.
@@ -1106,7 +1383,8 @@ def _separate_names(authors):
     )
 
     # Extract actual name if additional author information are given via dict
-    author_names.DBLPName = author_names.DBLPName.apply(lambda x: _extract(x, "text"))
+    if not structured:
+        author_names.DBLPName = _extract_all(author_names.DBLPName, ["text"]).text
 
     # Drop authors with one name only from alternative_names
     dblp_names = author_names.DBLPName.drop_duplicates()
@@ -1116,7 +1394,8 @@ def _separate_names(authors):
     alternative_names = alternative_names.explode("FullName")
 
     # Extract actual name if additional author information are given via dict
-    alternative_names.FullName = alternative_names.FullName.apply(lambda x: _extract(x, "text"))
+    if not structured:
+        alternative_names.FullName = _extract_all(alternative_names.FullName, ["text"]).text
     alternative_names.reset_index(drop=True, inplace=True)
 
     return dblp_names, alternative_names
@@ -1126,19 +1405,29 @@ def _prepare_affiliations(www):
     """
     Expect column note of df www to contain dblp.xml's notes of www entries separated by newline in case of multiple
     notes per person. Pick the first affiliation only in case multiple ones are listed in and not specified further by
-    a type like 'award', 'uname', 'isnot' or 'former' or by a label like 'former' or specific period of time
+    a type like 'award', 'uname', 'isnot' or 'former' or by a label like 'former' or specific period of time.
+    If www contains the columns 'note.type' and 'note.label' (read from parquet files), the notes are plain texts and
+    their types and labels are given in these columns line by line instead of dicts.
     :param www: pd.Dataframe
     :return: pd.Series, containing one affiliation (or none) for each person that was given in df www.
     """
     www = www.copy()
-    www.note = www.note.apply(lambda x: x.split("\n") if pd.notnull(x) else "")
-    www = www.explode("note")
+    if "note.type" in www.columns:
+        www.note = www.note.apply(lambda x: x.split("\n") if pd.notnull(x) else [""])
+        for column in ["note.type", "note.label"]:
+            www[column] = [
+                [value or None for value in values.split("\n")] if pd.notnull(values) else [None] * len(notes)
+                for values, notes in zip(www[column], www.note)
+            ]
+        www = www.explode(["note", "note.type", "note.label"])
+        www.rename(columns={"note": "text", "note.type": "type", "note.label": "label"}, inplace=True)
+    else:
+        www.note = www.note.apply(lambda x: x.split("\n") if pd.notnull(x) else "")
+        www = www.explode("note")
 
-    # Split notes into type, label and text for easier handling
-    www["label"] = www.note.apply(lambda x: _extract(x, "label"))
-    www["type"] = www.note.apply(lambda x: _extract(x, "type"))
-    www["text"] = www.note.apply(lambda x: _extract(x, "text"))
-    www.drop(columns=["note"], inplace=True)
+        # Split notes into type, label and text for easier handling
+        www[["label", "type", "text"]] = _extract_all(www.note, ["label", "type", "text"]).to_numpy()
+        www.drop(columns=["note"], inplace=True)
 
     # Drop unnecessary note types like 'award', 'uname', 'isnot' and 'former'
     www = www[www.type.isin(["affiliation", None])]
@@ -1170,13 +1459,60 @@ def _extract(element, attribute):
         return None
 
 
-def _prepare_urls(urls):
+def _extract_all(elements, attributes):
+    """
+    Batch version of _extract() for a whole series. Each distinct dict-encoded value is parsed only once for all
+    requested attributes instead of twice per value and attribute.
+    :param elements:    pd.Series of strings or None, derives from a column of a csv file produced by dplp_parser.py
+    :param attributes:  list of strings, the to be extracted dict values if an element contains a dict
+    :return:            pd.DataFrame, with one column per attribute and the same index as elements. Columns contain the
+                        same values _extract() would return for each element and attribute.
+    """
+    elements = elements.astype(object)
+    is_dict = (elements.str.startswith("{", na=False) & elements.str.endswith("}", na=False)).to_numpy()
+
+    dict_elements = elements[is_dict].tolist()
+    parsed = {element: ast.literal_eval(element) for element in set(dict_elements)}
+    decoded = [parsed[element] for element in dict_elements]
+
+    # Work on positions as the index of elements may contain duplicates, e.g. after exploding
+    result = pd.DataFrame(index=elements.index)
+    for attribute in attributes:
+        if attribute == "text":
+            # Elements without a dict (or dicts without text) contain the text itself
+            values = elements.to_numpy(copy=True)
+            values[is_dict] = [x["text"] if "text" in x else element for x, element in zip(decoded, dict_elements)]
+        else:
+            values = np.full(len(elements), None, dtype=object)
+            values[is_dict] = [x.get(attribute) for x in decoded]
+        result[attribute] = values
+    return result
+
+
+def _extract_texts(elements, structured):
+    """
+    Extract the texts of the elements that were read from csv files, where additional information is given via dict.
+    Elements read from parquet files are plain texts already.
+    :param elements:    pd.Series of strings or None, derives from a column of a file produced by dplp_parser.py
+    :param structured:  pd.Series of bool, whether each element was read from a parquet file
+    :return:            np.ndarray, the texts of the elements in the same order
+    """
+    texts = elements.to_numpy(dtype=object, copy=True)
+    # Work on positions as the index of elements may contain duplicates, e.g. after concatenating
+    from_csv = ~structured.to_numpy(dtype=bool)
+    if from_csv.any():
+        texts[from_csv] = _extract_all(elements[from_csv], ["text"]).text.to_numpy()
+    return texts
+
+
+def _prepare_urls(urls, types=None):
     """
     Separates web pages of a person into ORCID pages, Google Scholar pages and remaining ones. If there are multiple
     pages of one kind, they are separated by a \n . Some urls from dblp come with a type like 'archive' which get
     appended to the respective url in brackets (See _append_type() for details).
     :param urls:    String, containing urls separated by \n (or dictionaries containing additional information about one
                     url) from dblp.
+    :param types:   String or None, containing the type of each url in urls separated by \n (read from parquet files).
     :return:        triple of strings, first one contains all orcid pages, second one all google scholar pages and last
                     one all remaining web pages of a person.
     """
@@ -1185,10 +1521,11 @@ def _prepare_urls(urls):
     homepages = []
 
     urls = urls.split("\n") if pd.notnull(urls) else None
+    types = types.split("\n") if pd.notnull(types) else [None] * len(urls or [])
 
     if urls:
-        for url in urls:
-            url = _append_type(url)
+        for url, url_type in zip(urls, types):
+            url = _append_type(url, url_type)
             if "orcid.org" in url:
                 orcid_page.append(url)
             elif "scholar.google.com" in url:
@@ -1203,14 +1540,17 @@ def _prepare_urls(urls):
     return orcid_page, google_scholar_page, homepages
 
 
-def _append_type(url):
+def _append_type(url, url_type=None):
     """
     Check if the given url is a dictionary containing additional information from dblp and extracts the url and the type
     (like 'deprecated' or 'archive').
-    :param url: string, containing a dictionary with the url given in 'text'
+    :param url:         string, containing a dictionary with the url given in 'text'
+    :param url_type:    string or None, the type of a plain url (read from parquet files)
     :return: string, the url given in url['text'] followed by url['type'] in brackets if given
     """
-    if url and url[0] == "{" and url[-1] == "}":
+    if url_type:
+        return url + " (" + url_type + ")"
+    elif url and url[0] == "{" and url[-1] == "}":
         url = ast.literal_eval(url)
         return url["text"] + " (" + url["type"] + ")" if "type" in url else url["text"]
     else:
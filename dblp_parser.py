@@ -2,11 +2,28 @@ import re
 import os
 from lxml import etree
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from utils import log
 
 if not os.path.exists("csv"):
     os.makedirs("csv")
 
+AFFILIATIONS_PATH = "csv/affiliations.csv"
+# Number of records buffered per entity before they are appended to its csv file
+CHUNK_SIZE = 100000
+# Attributes of dblp's level-1 elements that lead the columns of the files in streaming mode, followed by the further
+# attributes declared for the element in dblp.dtd, e.g. 'cdate' (see get_level_one_attributes())
+LEVEL_ONE_ATTRIBUTES = ["key", "mdate", "publtype"]
+# Attributes of sub-elements that are kept in separate '<tag>.<attribute>' columns when writing parquet files
+STRUCTURED_ATTRIBUTES = {
+    "author": ["orcid"],
+    "editor": ["orcid"],
+    "ee": ["type"],
+    "note": ["type", "label"],
+    "url": ["type"],
+}
+
 
 def extract_title(title_element):
     """
@@ -20,20 +37,41 @@ def extract_title(title_element):
     return title
 
 
-def extract_feature(elem, features):
+def extract_feature(elem, features, structured=False):
     """
     Extract the value of each feature of the element as well as its attributes.
     :param elem:        lxml.etree.Element, the element whose features are to be extracted.
     :param features:    List of strings, the to be extracted sub-elements of elem
+    :param structured:  bool, whether to put the attributes of sub-elements listed in STRUCTURED_ATTRIBUTES into
+                        separate '<tag>.<attribute>' keys instead of encoding sub-elements as dicts, default: False
 
     :return:    Dict of attributes and sub-elements of elem. Sub-elements are encoded as dicts if they have attributes,
-                otherwise they contain only their text values.
+                otherwise they contain only their text values. If structured, the values of multiple sub-elements with
+                the same tag and of their attributes are separated by line breaks in the same order.
     """
     attribs = {}
     # Extract attributes of level-1 element
     for attribute in elem.attrib:
         attribs[attribute] = elem.attrib[attribute]
 
+    if structured:
+        lines = {}
+        for sub in elem:
+            if sub.tag not in features:
+                continue
+            text = extract_title(sub) if sub.tag == "title" else sub.text
+            if text is not None and len(text) > 0:
+                lines.setdefault(sub.tag, []).append(text)
+                # Add a line for every sub-element, even if the attribute is missing, to keep the lines aligned
+                for attribute in STRUCTURED_ATTRIBUTES.get(sub.tag, []):
+                    lines.setdefault(f"{sub.tag}.{attribute}", []).append(sub.get(attribute, ""))
+        for column, values in lines.items():
+            attribs[column] = "\n".join(values) if any(values) else None
+        # Remove content of processed elem from the tree to save memory
+        elem.clear()
+
+        return attribs
+
     # Extract wanted sub-elements
     for sub in elem:
         if sub.tag not in features:
@@ -54,39 +92,272 @@ def extract_feature(elem, features):
     return attribs
 
 
+class ChunkedCsvWriter:
+    """
+    Sink for parsed records that appends them to a csv file in batches of fixed size instead of keeping all of them in
+    memory. The columns of the csv file are fixed up front, so every batch is written with the same schema.
+    """
+
+    def __init__(self, save_path, columns, chunk_size=CHUNK_SIZE):
+        """
+        :param save_path:   string, csv save path including file name and extension '.csv'
+        :param columns:     list of strings, the columns of the csv file
+        :param chunk_size:  int, the number of records to buffer before appending them to the csv file
+        """
+        self.save_path = save_path
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.buffer = []
+        self.count = 0
+        self.header_written = False
+
+    def append(self, record):
+        self.buffer.append(record)
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        # Keys missing in a record become empty cells, unexpected keys are dropped to keep the schema stable
+        pd.DataFrame(self.buffer, columns=self.columns).to_csv(
+            self.save_path,
+            index=False,
+            mode="a" if self.header_written else "w",
+            header=not self.header_written,
+        )
+        self.header_written = True
+        self.count += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        # Always flush, so that the file is created with its header even if there are no records at all
+        if self.buffer or not self.header_written:
+            self.flush()
+        return self.count
+
+
+class ChunkedParquetWriter(ChunkedCsvWriter):
+    """
+    Sink like ChunkedCsvWriter that writes the batches as row groups of a parquet file with string columns instead.
+    """
+
+    def __init__(self, save_path, columns, chunk_size=CHUNK_SIZE):
+        super().__init__(save_path, columns, chunk_size)
+        self.schema = pa.schema([(column, pa.string()) for column in columns])
+        self.writer = None
+
+    def flush(self):
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.save_path, self.schema)
+        self.writer.write_table(
+            pa.Table.from_pandas(
+                pd.DataFrame(self.buffer, columns=self.columns),
+                schema=self.schema,
+                preserve_index=False,
+            )
+        )
+        self.header_written = True
+        self.count += len(self.buffer)
+        self.buffer = []
+
+    def close(self):
+        count = super().close()
+        self.writer.close()
+        return count
+
+
+def get_level_one_attributes(dblp_path):
+    """
+    Read the attributes that the ATTLISTs of dblp.dtd declare for each element, so that the fixed columns of the files
+    in streaming mode keep every attribute of a level-1 element.
+    :param dblp_path:   string, path the dblp.xml and dblp.dtd
+
+    :return:    dict, mapping each element tag to its attributes, LEVEL_ONE_ATTRIBUTES first and the others sorted
+    """
+    dtd = etree.DTD(os.path.join(os.path.dirname(dblp_path), "dblp.dtd"))
+    return {
+        element.name: LEVEL_ONE_ATTRIBUTES
+        + sorted(
+            attribute.name
+            for attribute in element.iterattributes()
+            if attribute.name not in LEVEL_ONE_ATTRIBUTES
+        )
+        for element in dtd.iterelements()
+    }
+
+
+def get_columns(features, file_format="csv", attributes=LEVEL_ONE_ATTRIBUTES):
+    """
+    Get the fixed columns of the output file of an entity with the given features.
+    :param features:    list of strings, the tags of sub-elements of the entity
+    :param file_format: string, 'csv' or 'parquet'
+    :param attributes:  list of strings, the attributes of the entity, see get_level_one_attributes()
+
+    :return:    list of strings
+    """
+    columns = list(attributes)
+    for feature in features:
+        columns.append(feature)
+        if file_format == "parquet":
+            columns += [f"{feature}.{attribute}" for attribute in STRUCTURED_ATTRIBUTES.get(feature, [])]
+    return columns
+
+
+def get_writer(save_path, features, chunk_size, file_format="csv", attributes=LEVEL_ONE_ATTRIBUTES):
+    """
+    Create the streaming sink for the output file of an entity with the given features.
+    :param save_path:   string, save path including file name and extension
+    :param features:    list of strings, the tags of sub-elements of the entity
+    :param chunk_size:  int, the number of records to buffer before appending them to the file
+    :param file_format: string, 'csv' or 'parquet'
+    :param attributes:  list of strings, the attributes of the entity, see get_level_one_attributes()
+
+    :return:    ChunkedCsvWriter or ChunkedParquetWriter
+    """
+    writer = ChunkedParquetWriter if file_format == "parquet" else ChunkedCsvWriter
+    return writer(save_path, get_columns(features, file_format, attributes), chunk_size)
+
+
+def save(df, save_path, file_format="csv"):
+    """
+    Save the given results of an entity either as csv or as parquet file.
+    :param df:          pandas.DataFrame
+    :param save_path:   string, save path including file name and extension
+    :param file_format: string, 'csv' or 'parquet'
+    """
+    if file_format == "parquet":
+        df.to_parquet(save_path, index=False)
+    else:
+        df.to_csv(save_path, index=False)
+
+
 def extract_entity(
-    entity, features, dblp_path, save_path=None, ignorable_elements=None
+    entity,
+    features,
+    dblp_path,
+    save_path=None,
+    ignorable_elements=None,
+    chunk_size=None,
+    file_format="csv",
 ):
     """
     Parse specific elements according to the given type name and features.
     :param entity:              string, has to be same as the xml element tag
     :param features:            list of strings, the tags of sub-elements of entity
     :param dblp_path:           string, path the dblp.xml and dblp.dtd
-    :param save_path:           string, csv save path including file name and extension '.csv', default: None
-                                If None, it does not save the results.
+    :param save_path:           string, save path including file name and extension '.csv' or '.parquet', default:
+                                None. If None, it does not save the results.
     :param ignorable_elements:  list of strings, the tags of level one xml elements unequal entity
+    :param chunk_size:          int, default: None. If given together with save_path, the results are not kept in
+                                memory but appended to the csv file in batches of chunk_size records.
+    :param file_format:         string, 'csv' or 'parquet', default: 'csv'. Parquet files keep the attributes of
+                                sub-elements in separate columns (see extract_feature()) instead of dicts.
 
-    :return:    pandas.DataFrame with attributes and sub-elements of entity as columns
+    :return:    pandas.DataFrame with attributes and sub-elements of entity as columns or, in streaming mode, the
+                number of records written
     """
     log(f"PROCESS: Start parsing for {entity}...")
-    results = []
+    if chunk_size and save_path:
+        attributes = get_level_one_attributes(dblp_path).get(entity, LEVEL_ONE_ATTRIBUTES)
+        results = get_writer(save_path, features, chunk_size, file_format, attributes)
+    else:
+        results = []
     for _, elem in etree.iterparse(
         source=dblp_path, dtd_validation=True, load_dtd=True
     ):
         if elem.tag == entity:
-            attrib_values = extract_feature(elem, features)
+            attrib_values = extract_feature(elem, features, structured=file_format == "parquet")
             results.append(attrib_values)
         elif ignorable_elements and elem.tag in ignorable_elements:
             # Remove content of needless elems from the tree to save memory
             elem.clear()
 
+    if isinstance(results, ChunkedCsvWriter):
+        return results.close()
+
     df = pd.json_normalize(results)
     if save_path:
-        df.to_csv(save_path, index=False)
+        save(df, save_path, file_format)
     return df
 
 
-def main():
+def extract_entities(
+    key_features,
+    dblp_path,
+    save_dir=None,
+    affiliations_path=None,
+    chunk_size=None,
+    file_format="csv",
+):
+    """
+    Parse all given entities in a single pass over dblp.xml instead of re-parsing the whole file once per entity. Each
+    level-1 element is routed to the results of its own entity. The texts of all notes with type 'affiliation' are
+    collected during the same pass, so database.fill_affiliations() does not need to parse dblp.xml again.
+    :param key_features:        dict, mapping each entity (xml element tag) to the list of tags of its sub-elements
+    :param dblp_path:           string, path the dblp.xml and dblp.dtd
+    :param save_dir:            string, directory to save one file per entity to, named '<entity>.<file_format>',
+                                default: None. If None, it does not save the results.
+    :param affiliations_path:   string, csv save path of the unique affiliations including file name and extension
+                                '.csv', default: None. If None, it does not save the affiliations.
+    :param chunk_size:          int, default: None. If given together with save_dir, the results are not kept in
+                                memory but appended to the csv files in batches of chunk_size records.
+    :param file_format:         string, 'csv' or 'parquet', default: 'csv'. Parquet files keep the attributes of
+                                sub-elements in separate columns (see extract_feature()) instead of dicts.
+
+    :return:    tuple of    1. dict, mapping each entity to a pandas.DataFrame with its attributes and sub-elements as
+                            columns or, in streaming mode, to the number of records written and
+                            2. set of strings, the unique affiliations found in dblp.xml
+    """
+    log(f"PROCESS: Start single-pass parsing for {', '.join(key_features.keys())}...")
+    if chunk_size and save_dir:
+        attributes = get_level_one_attributes(dblp_path)
+        results = {
+            entity: get_writer(
+                os.path.join(save_dir, f"{entity}.{file_format}"),
+                features,
+                chunk_size,
+                file_format,
+                attributes.get(entity, LEVEL_ONE_ATTRIBUTES),
+            )
+            for entity, features in key_features.items()
+        }
+    else:
+        results = {entity: [] for entity in key_features}
+    raw_affiliations = set()
+    for _, elem in etree.iterparse(
+        source=dblp_path, dtd_validation=True, load_dtd=True
+    ):
+        if elem.tag in results:
+            results[elem.tag].append(
+                extract_feature(
+                    elem, key_features[elem.tag], structured=file_format == "parquet"
+                )
+            )
+        elif (
+            elem.tag == "note"
+            and elem.get("type") == "affiliation"
+            and elem.text is not None
+        ):
+            # Remove leading and trailing spaces
+            raw_affiliations.add(elem.text.strip())
+    log("PROCESS: Single-pass parsing finished")
+
+    dfs = {}
+    for entity, entity_results in results.items():
+        if isinstance(entity_results, ChunkedCsvWriter):
+            dfs[entity] = entity_results.close()
+            continue
+        dfs[entity] = pd.json_normalize(entity_results)
+        if save_dir:
+            save(dfs[entity], os.path.join(save_dir, f"{entity}.{file_format}"), file_format)
+
+    if affiliations_path:
+        pd.DataFrame(sorted(raw_affiliations), columns=["FullAffiliation"]).to_csv(
+            affiliations_path, index=False
+        )
+    return dfs, raw_affiliations
+
+
+def main(single_pass=True, file_format="csv"):
     dblp_path = "dblp/dblp.xml"
 
     key_features = {
@@ -149,8 +420,19 @@ def main():
         "www": ["author", "note", "title", "url"],
     }
 
+    if single_pass:
+        extract_entities(
+            key_features,
+            dblp_path,
+            save_dir="csv",
+            affiliations_path=AFFILIATIONS_PATH,
+            chunk_size=CHUNK_SIZE,
+            file_format=file_format,
+        )
+        return
+
     for element in key_features.keys():
-        save_path = "csv/" + str(element) + ".csv"
+        save_path = "csv/" + str(element) + "." + file_format
         # Set list of ignorable elements for less memory usage
         ignorable_elements = list(key_features.keys())
         ignorable_elements.remove(element)
@@ -160,6 +442,8 @@ def main():
             dblp_path,
             save_path,
             ignorable_elements=ignorable_elements,
+            chunk_size=CHUNK_SIZE,
+            file_format=file_format,
         )
 
 
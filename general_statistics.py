@@ -1,17 +1,22 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
+from types import MappingProxyType
+import io
 import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 import graph_logic
+from connection_pool import borrow_connection
 
 # Get general statistics about the data
-def display_general_statistics(cursor):
+def display_general_statistics():
 
     # Load all the general statistics out of the corresponding table
     with st.spinner("Loading general statistics..."):
+        statistics = load_general_statistics()
         for statistic_name, session_state_key in zip(statistics_to_check, session_state_keys):
             if session_state_key not in st.session_state:
-                value = get_statistic_from_db(cursor, statistic_name)
+                value = statistics.get(statistic_name)
 
                 if value is not None:
                     if session_state_key != "last_time_updated":
@@ -100,18 +105,17 @@ def display_general_statistics(cursor):
     )
 
     # plots the first pie chart
-    fig1 = plt.figure()
-    ax1 = fig1.add_subplot()
-    ax1.pie(
-        [# replace is used to remove the space, for example to convert "6 760" to "6760"
-        numOfWomenInContinent.replace(" ",""), 
-        numOfMenInContinent.replace(" ",""), 
-        numOfUnknownInContinent.replace(" ","")
-        ],
-        labels=["Woman", "Man", "unknown"], autopct='%.1f%%', startangle=90, textprops={"fontsize": 15}, 
-        colors=plt.cm.Dark2.colors[3:], wedgeprops={"linewidth":3}
-    )
-    col2.pyplot(fig1)
+    col2.image(
+        render_pie_chart(
+            (# replace is used to remove the space, for example to convert "6 760" to "6760"
+            int(numOfWomenInContinent.replace(" ","")),
+            int(numOfMenInContinent.replace(" ","")),
+            int(numOfUnknownInContinent.replace(" ",""))
+            ),
+            ("Woman", "Man", "unknown"), colors=plt.cm.Dark2.colors[3:], wedgeprops={"linewidth":3}
+        ),
+        use_column_width=True,
+    )
 
     # defines the third collumn
     # calculates the percentage of papers that were written in the selected continent
@@ -122,16 +126,13 @@ def display_general_statistics(cursor):
     )
 
     # plots the second pie chart
-    fig2 = plt.figure()
-    ax2 = fig2.add_subplot()
-    ax2.pie(
-        [
-        continent_percentage,
-        1 - continent_percentage],
-        labels = [selectedContinent[0], "Other"], autopct = "%.1f%%", startangle = 90, textprops = {"fontsize": 15}, 
-        colors=plt.cm.tab20.colors[4:], explode=(0.1,0)
+    col4.image(
+        render_pie_chart(
+            (continent_percentage, 1 - continent_percentage),
+            (selectedContinent[0], "Other"), colors=plt.cm.tab20.colors[4:], explode=(0.1,0)
+        ),
+        use_column_width=True,
     )
-    col4.pyplot(fig2)
 
     st.subheader("Instructions")
     st.markdown(
@@ -147,15 +148,34 @@ def display_general_statistics(cursor):
     )
 
 
-def get_statistic_from_db(cursor, statistic_name):
-    sql = f"""SELECT Value\nFROM GeneralStatistics WHERE Name = "{statistic_name}";"""
-    cursor.execute(sql)
-    result = cursor.fetchall()
-
-    if not result:
-        return None
-
-    return result[0][0] if result else None
+@st.cache_data(max_entries=100, show_spinner=False)
+def render_pie_chart(values, labels, **kwargs):
+    """
+    Render a pie chart into a png image, the same way st.pyplot() would. The figure is not registered with pyplot, so
+    it is freed right after rendering instead of being kept open across reruns.
+    :param values:  tuple of numbers, sizes of the wedges
+    :param labels:  tuple of str, labels of the wedges
+    :param kwargs:  further arguments of matplotlib's pie(), e.g. colors
+    :return:        bytes, the png image
+    """
+    fig = Figure()
+    ax = fig.add_subplot()
+    ax.pie(values, labels=labels, autopct="%.1f%%", startangle=90, textprops={"fontsize": 15}, **kwargs)
+    image = io.BytesIO()
+    fig.savefig(image, format="png", bbox_inches="tight", dpi=200)
+    return image.getvalue()
+
+
+@st.cache_resource(show_spinner=False)
+def load_general_statistics():
+    """
+    Load all general statistics out of the table GeneralStatistics at once. They are shared by all sessions of the app
+    process and loaded once per process. They are not keyed by the build date of the database: the connection pool
+    opens the database as immutable and would not read a rebuilt one either, so restart the app after rebuilding it.
+    :return:    MappingProxyType, mapping the name of each statistic to its value
+    """
+    with borrow_connection() as connection:
+        return MappingProxyType(dict(connection.execute("SELECT Name, Value FROM GeneralStatistics;").fetchall()))
 
 
 statistics_to_check = [
@@ -1,9 +1,15 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import prototype as pt
 import plotly.graph_objects as go
+import os
 import re
-import requests
+from collections import namedtuple
+from types import MappingProxyType
+from activity_log_client import log_event
+from connection_pool import borrow_connection
+from query_cache import get_query_cache, normalize_filters
 from utils import log
 
 
@@ -29,56 +35,77 @@ class FilterData:
         return False
 
 
+# The filters of the graphs shown on the first visit of a session. database.py materializes them into DefaultGraph,
+# which are only used if they were built for the same minimum number of publications, see load_default_graphs()
+DEFAULT_GRAPH_MIN_PUBLICATION_COUNT = 0
+DEFAULT_GRAPH_AUTHOR_POSITION = "First author woman"
+
+# The condition on the author position and the gender for each author position the user can select
+AUTHOR_POSITION_FILTERS = {
+    "First author woman": ("Position = 1", "woman"),
+    "Last author woman": ("Position = AuthorCount", "woman"),
+    "Middle author woman": ("Position > 1 AND Position < AuthorCount", "woman"),
+    "Any author woman": ("", "woman"),
+    "First author man": ("Position = 1", "man"),
+    "Last author man": ("Position = AuthorCount", "man"),
+    "Middle author man": ("Position > 1 AND Position < AuthorCount", "man"),
+    "Any author man": ("", "man"),
+}
+
+# AllTogether stores the filtered dimensions as IDs, for each one the ID column and the table and column of its names
+LOOKUP_TABLES = {
+    "Venue": ("VenueID", "Venue", "Name"),
+    "ResearchArea": ("ResearchAreaID", "ResearchArea", "Name"),
+    "Country": ("CountryID", "Country", "DisplayName"),
+    "Continent": ("ContinentID", "Continent", "Name"),
+    "PublicationType": ("PublicationTypeID", "PublicationType", "Name"),
+}
+# The pre-calculated filter csv files written by database.py
+FILTER_FILES = [
+    "filters/Countries.csv",
+    "filters/Venues.csv",
+    "filters/PublicationTypes.csv",
+    "filters/ResearchAreas.csv",
+]
+# The options of all filters, shared by all sessions of the app process
+FilterOptions = namedtuple(
+    "FilterOptions",
+    [
+        "continents",
+        "countries",
+        "publication_types",
+        "research_areas",
+        "country_continent_data",
+        "venue_data",
+        "venue_labels",
+    ],
+)
+# Maximum number of selected values of a dimension that are looked up by a chain of equalities instead of IN
+MAX_EQUALITY_CHAIN = 5
+
+
 # Display all the filters that the user can select
 def display_filters():
     if "filters" not in st.session_state:
         st.session_state.filters = FilterData()
     if st.session_state.filters.is_any_list_empty():
-        # Concept for getting the filters:
-        # 1. Read the csv
-        # 2. Get the specific column
-        # 3. Convert it to a list
-        # 4. Sort the list ascending
-        # 5. Convert the sorted list into a tuple for future processes
-        #
-        # Concwept applies to all the other filters as well
-
-        country_continent_data = pd.read_csv("filters/Countries.csv")
-        country_continent_data = pd.concat(
-            [
-                country_continent_data,
-                pd.DataFrame(
-                    {
-                        "Country": ["Unknown"],
-                        "Continent": ["Unknown"],
-                    },
-                ),
-            ],
-        )
-        st.session_state.country_continent_dataframe = country_continent_data
+        # The options are loaded once per version of the filter files and only referenced by the session
+        filter_options = load_filter_options(get_filter_options_stamp())
+        st.session_state.country_continent_dataframe = filter_options.country_continent_data
 
         st.session_state.min_venue_publications = 0
-        st.session_state.venue_data = pd.read_csv("filters/Venues.csv")
-        publication_types_data = pd.read_csv("filters/PublicationTypes.csv")
-        research_areas_data = pd.read_csv("filters/ResearchAreas.csv")
-
-        continents = sorted(list(set(country_continent_data["Continent"])))
-
-        countries = sorted(list(country_continent_data["Country"]))
+        st.session_state.venue_data = filter_options.venue_data
+        st.session_state.venue_labels = filter_options.venue_labels
 
         venues = update_min_venue_publications(1)
 
-        publication_types = sorted(list(publication_types_data["PublicationType"]))
-
-        research_areas = sorted(list(research_areas_data["ResearchArea"]))
-
         st.session_state.filters = FilterData(
-            continents,
-            countries,
+            filter_options.continents,
+            filter_options.countries,
             venues,
             0,
-            publication_types,
-            research_areas,
+            filter_options.publication_types,
+            filter_options.research_areas,
         )
 
     prefill_graph()
@@ -158,34 +185,81 @@ def display_filters():
                 st.session_state.widget_data_representation,
             )
 
+def get_filter_options_stamp():
+    """
+    Get the modification times of the filter csv files, so that the filter options are loaded again whenever the files
+    are rewritten. Only the files' metadata is read, not their content.
+    :return:    tuple of int, the modification time of each file of FILTER_FILES in nanoseconds
+    """
+    return tuple(os.stat(path).st_mtime_ns for path in FILTER_FILES)
+
+
+# Only the options of the current version of the filter files are kept
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_filter_options(stamp):
+    """
+    Load the options of all filters out of the pre-calculated filter csv files. They are shared by all sessions of the
+    app process, so the lists are stored as tuples and the data frames must not be modified.
+    :param stamp:   tuple, the modification times of the filter files from get_filter_options_stamp(), so that the
+                    options are loaded again if the files change
+    :return:        FilterOptions
+    """
+    # Concept for getting the filters:
+    # 1. Read the csv
+    # 2. Get the specific column
+    # 3. Sort it ascending
+    # 4. Convert the sorted list into a tuple for future processes
+    #
+    # Concept applies to all the other filters as well
+    country_continent_data = pd.concat(
+        [
+            pd.read_csv("filters/Countries.csv"),
+            pd.DataFrame(
+                {
+                    "Country": ["Unknown"],
+                    "Continent": ["Unknown"],
+                },
+            ),
+        ],
+    )
+
+    # The venues are offered in descending order of their number of publications
+    venue_data = pd.read_csv("filters/Venues.csv").sort_values(
+        "NumOfPublications", ascending=False, kind="stable", ignore_index=True
+    )
+    # Venue names are not unique, each name is labeled with the highest number of publications of its venues
+    venue_labels = venue_data.drop_duplicates("Name")
+    venue_labels = dict(
+        zip(venue_labels["Name"], venue_labels["NumOfPublications"].astype(str) + " | " + venue_labels["Name"])
+    )
+
+    return FilterOptions(
+        continents=tuple(sorted(set(country_continent_data["Continent"]))),
+        countries=tuple(sorted(country_continent_data["Country"])),
+        publication_types=tuple(sorted(pd.read_csv("filters/PublicationTypes.csv")["PublicationType"])),
+        research_areas=tuple(sorted(pd.read_csv("filters/ResearchAreas.csv")["ResearchArea"])),
+        country_continent_data=country_continent_data,
+        venue_data=venue_data,
+        venue_labels=MappingProxyType(venue_labels),
+    )
+
+
 def format_function(name):
     """
     formats the venue options, to display their number of publications
     """
-    return f"{st.session_state.pub_counts[st.session_state.filters.venues.index(name)]} | {name}"
+    return st.session_state.venue_labels[name]
 
 def update_min_venue_publications(minimum=None):
     """
     Gets called by on_change attribute of the number input.
     Updates the list of available venues according to their number of publications
     """
-    venues = []
-    st.session_state.pub_counts = []
-    # iterates over all venues and filters out the ones with less publications than min_publication_count
-    try:
-        for venue in st.session_state.venue_data.iterrows():
-            # df.iterrows returns (Index, Series(data)) so we have to get rid of the index using [1]
-            if venue[1]["NumOfPublications"] >= st.session_state.min_publication_count:
-                venues.append(venue[1]["Name"])
-                st.session_state.pub_counts.append(venue[1]["NumOfPublications"])
-    except AttributeError:
-        for venue in st.session_state.venue_data.iterrows():
-            # df.iterrows returns (Index, Series(data)) so we have to get rid of the index using [1]
-            if venue[1]["NumOfPublications"] >= minimum:
-                venues.append(venue[1]["Name"])
-                st.session_state.pub_counts.append(venue[1]["NumOfPublications"])
-    # removes the few conferences, that include a " char
-    venues = [x for x in venues if '"' not in x]
+    # The minimum of the number input takes precedence over the given one, once the number input exists
+    minimum = st.session_state.get("min_publication_count", minimum)
+    # filters out the venues with less publications than the minimum
+    venue_data = st.session_state.venue_data
+    venues = venue_data["Name"][venue_data["NumOfPublications"] >= minimum].tolist()
     st.session_state.filters.venues = venues
     return venues
 
@@ -205,8 +279,8 @@ def clear_filters():
 
 
 # Update the year range
-# As soon as the year range changes, the graph
-# will be rebuild
+# As soon as the year range changes, the data
+# of the graph will be updated
 # The minimum value and maximum value
 # automatically get converted into a list between
 # these two values
@@ -237,7 +311,7 @@ def update_year_range():
             st.session_state.year_range[1] + 1,
         )
     )
-    paint_graph()
+    update_graph_data()
 
 
 def update_available_countries():
@@ -270,14 +344,24 @@ def prefill_graph():
 
         continents = ["Europe", "Asia", "North America", "South America", "Africa", "Oceania"]
         st.session_state.is_first_submit = False
+        # The graphs of the continents are materialized into the table DefaultGraph, see load_default_graphs(). If they
+        # can not be taken from there, they are queried all at once and update_graph() takes them from the query cache
+        query_batch(
+            [
+                normalize_filters(
+                    [], DEFAULT_GRAPH_MIN_PUBLICATION_COUNT, [], [i], [], DEFAULT_GRAPH_AUTHOR_POSITION, []
+                )
+                for i in continents
+            ]
+        )
         for i in continents:
             update_graph(
                 [],
-                0,
+                DEFAULT_GRAPH_MIN_PUBLICATION_COUNT,
                 [],
                 [i],
                 [],
-                "First author woman",
+                DEFAULT_GRAPH_AUTHOR_POSITION,
                 [],
                 "Relative numbers",
             )
@@ -336,65 +420,14 @@ def populate_graph(venue, min_publication_count, country, cont, publication_type
 
     # the column/fiter names for each selection
     y_name = ""
-
-    # Creates query
-    # For each available filter, check if the user has filtered something there
-    # If so, go through every selection and add them as a filter group (statement OR statement OR...)
-    def build_filter(filter_list, field_name, y_name):
-        if not filter_list:
-            return "", y_name
-
-        filter_str = "({})".format(
-            " or ".join(
-                f'alto.{field_name} = "{item}"' if item != "Unknown" else f"{field_name} IS NULL" for item in filter_list
-            )
-        )
-        y_name += ", ".join(filter_list) + ", "
-        return filter_str, y_name
-
-    f_1, y_name = build_filter(venue, "Venue", y_name)
-    f_2, y_name = build_filter(research_area, "ResearchArea", y_name)
-    f_3, y_name = build_filter(country, "Country", y_name)
-    f_4, y_name = build_filter(cont, "Continent", y_name)
-    f_6, y_name = build_filter(publication_type, "PublicationType", y_name)
-    f_7 = f"v.NumOfPublications >= {min_publication_count}"
+    for filter_list in (venue, research_area, country, cont, publication_type):
+        if filter_list:
+            y_name += ", ".join(filter_list) + ", "
     # if there is already a venue in the filter it doesnt make sense to communikate the min pub count
     if min_publication_count > 1 and venue == []:
         y_name += f"min. pub. count: {min_publication_count} "
-
-    author_position_filters = {
-        "First author woman": ('Position = "1"', "woman"),
-        "Last author woman": ("CAST(Position AS INT) = AuthorCount", "woman"),
-        "Middle author woman": ("Position > 1 AND CAST(Position AS INT) < AuthorCount", "woman"),
-        "First author man": ('Position = "1"', "man"),
-        "Last author man": ("CAST(Position AS INT) = AuthorCount", "man"),
-        "Middle author man": ("Position > 1 AND CAST(Position AS INT) < AuthorCount", "man"),
-    }
-
-    sql_gender = ""
-    if author_position in {"Any author woman", "Any author man"}:
-        f_5 = ""
+    if author_position in AUTHOR_POSITION_FILTERS:
         y_name += author_position
-        sql_gender = "woman" if author_position == "Any author woman" else "man"
-    elif author_position in author_position_filters:
-        filter_str, sql_gender = author_position_filters[author_position]
-        f_5 = f"({filter_str})"
-        y_name += author_position
-    else:
-        f_5 = ""
-
-    sql_logic = [f_1, f_2, f_3, f_4, f_5, f_6, f_7]
-    newf = ""
-    f_count = 0
-
-    # Combine each filter group with an AND operation
-    if not all(not f for f in sql_logic):
-        for f in sql_logic:
-            if f != "":
-                if f_count > 0:
-                    newf = newf + " AND "
-                f_count += 1
-                newf = newf + f
 
     # Convert the data from the range selector into a list
     # that includes all the years within this range
@@ -405,48 +438,21 @@ def populate_graph(venue, min_publication_count, country, cont, publication_type
         )
     )
 
-    # Basic SQL query structure
-
-    # The query creates a table with Year | Absolute | Relative columns
-    # It first counts all the Publications that match the WHERE conditions and where at least one woman is found
-    # The same is done for relative, but this also includes a calculation of the
-    # percentage where the publications with woman gender are divided by all the unique publications
-    sql_start = f"""SELECT 
-    alto.Year, 
-    COUNT(DISTINCT 
-        CASE 
-        WHEN alto.Gender = '{sql_gender}' THEN alto.PublicationID 
-        END
-    ) AS Absolute, 
-    COUNT(DISTINCT 
-        CASE 
-        WHEN alto.Gender = '{sql_gender}' THEN alto.PublicationID 
-        END
-    ) * 100 / COUNT(DISTINCT alto.PublicationID) AS Relative
-    FROM AllTogether alto
-    INNER JOIN Venue v ON alto.Venue = v.Name
-        """
-    sql_filter_start = """\nWHERE """
-    sql_end = """\nGROUP BY alto.Year;"""
-
     # Checks if the query was already requested
     # .startswith() is used, because item.name has a "(total:...) at the end"
     if not [item for item in st.session_state.y_columns if item.name.startswith(y_name)]:
         with st.spinner("Creating graph..."):
 
-            # If the query wasn't already requested, combine the different parts of it
-            sql_query = sql_start + (sql_filter_start if newf else "") + newf + sql_end
+            # If the query wasn't already requested, run it and process it, so that it's ready for the graph.
+            # Selections of the same filters in a different order share their cached result
+            filter_key = normalize_filters(
+                venue, min_publication_count, country, cont, publication_type, author_position, research_area
+            )
+            absolutes, relatives, total_absolutes = query_and_process(filter_key)
 
-            # Run the sql query and process it, so that it's ready for the graph
-            grouped_absolutes, grouped_relatives = query_and_process(sql_query)
-            
             # saves the absolutes in session_state for later use
             # .split(",")[0] is used to obtain the continent, from the name "Europe, First author Women" for example
-            st.session_state.grouped_absolutes[y_name.split(",")[0]] = sum(grouped_absolutes["Absolute"])
-
-            # Write a line of code that gets the sum of grouped_absolutes over years from result 
-            # and store it in a variable called total_absolutes
-            total_absolutes = sum(grouped_absolutes['Absolute'])
+            st.session_state.grouped_absolutes[y_name.split(",")[0]] = total_absolutes
 
             y_name = y_name + f" (Total: {total_absolutes})"
 
@@ -476,8 +482,9 @@ def populate_graph(venue, min_publication_count, country, cont, publication_type
                 pt.GraphData(
                     y_name,
                     True,
-                    grouped_absolutes.sort_index().to_dict()["Absolute"],
-                    grouped_relatives.sort_index().to_dict()["Relative"],
+                    get_year_axis(*st.session_state.min_max),
+                    absolutes,
+                    relatives,
                     COLORS[color_index],
                 ), ),
             # If statement to prevent logging the default graphs
@@ -486,18 +493,16 @@ def populate_graph(venue, min_publication_count, country, cont, publication_type
             ]) and author_position == "First author woman":
                 pass
             else:
-                try:
-                    requests.get('http://localhost:6502/log_graph_creation',
-                                 params={
-                                     'research_areas': research_area,
-                                     'publication_types': publication_type,
-                                     'venues': venue,
-                                     'continents': cont,
-                                     'countries': country,
-                                     'author_position': author_position,
-                                 })
-                except requests.exceptions.RequestException as e:
-                    print(f"Error logging graph: {e}")
+                # Queued and sent by a background thread, so creating the graph never waits for the activity logger
+                log_event(
+                    "graph_creation",
+                    research_areas=research_area,
+                    publication_types=publication_type,
+                    venues=venue,
+                    continents=cont,
+                    countries=country,
+                    author_position=author_position,
+                )
     else:# if graph was already requested, do nothing
         return
     # The graph_years are important for displaying only the
@@ -508,31 +513,347 @@ def populate_graph(venue, min_publication_count, country, cont, publication_type
     paint_graph()
 
 
-@st.cache_data(max_entries=1000, show_spinner=False)
-def query_and_process(sql_query):
-    # Run the sql query and convert it to a pandas dataframe
-    output = pd.read_sql(sql_query, st.session_state.connection)
+def build_filter(filter_list, column, params, lookup=None):
+    """
+    Build the condition of a filter group, which matches any of the selected values (statement OR statement OR...).
+    The values are bound as parameters of the query, so that queries of the same shape share their prepared statement.
+    :param filter_list: list of str, selected values. 'Unknown' matches rows without a value
+    :param column:      str, column the values are matched against
+    :param params:      list, parameters of the query, to which the selected values are appended
+    :param lookup:      str, key of LOOKUP_TABLES if the column refers to the dimension by its ID, so that the selected
+                        names are looked up in the dimension's table
+    :return:            str, the condition, or an empty string if nothing is selected
+    """
+    if not filter_list:
+        return ""
+
+    values = [item for item in filter_list if item != "Unknown"]
+    conditions = []
+    if values and lookup:
+        id_column, table, name_column = LOOKUP_TABLES[lookup]
+        # SQLite searches the index of AllTogether faster with a chain of equalities than with IN for few values only
+        if len(values) <= MAX_EQUALITY_CHAIN:
+            conditions += [f"{column} = (SELECT {id_column} FROM {table} WHERE {name_column} = ?)" for _ in values]
+        else:
+            placeholders = ", ".join("?" for _ in values)
+            conditions.append(f"{column} IN (SELECT {id_column} FROM {table} WHERE {name_column} IN ({placeholders}))")
+    elif values:
+        conditions.append(f"{column} = ?" if len(values) == 1 else f"{column} IN ({', '.join('?' for _ in values)})")
+    if len(values) < len(filter_list):
+        conditions.append(f"{column} IS NULL")
+    params.extend(values)
+    return "({})".format(" or ".join(conditions))
+
+
+def build_conditions(
+    venue, min_publication_count, country, cont, publication_type, author_position, research_area, params
+):
+    """
+    Build the conditions of a filter selection on the table AllTogether joined to the table Venue as v. The parameters
+    of the selection are the ones of build_query().
+    :param params:  list, parameters of the query, to which the selected values are appended
+    :return:        str, the conditions of all filter groups combined with AND
+    """
+    filter_str, _ = AUTHOR_POSITION_FILTERS.get(author_position, ("", ""))
 
-    # Drop the columns that are not needed for the specific use case
-    # And set the Year as the index
-    # Remove 2024 from response as well, because the data is not relevant
-    grouped_absolutes = output.drop("Relative", axis=1).set_index("Year").drop(2024, axis=0, errors="ignore")
-    grouped_relatives = output.drop("Absolute", axis=1).set_index("Year").drop(2024, axis=0, errors="ignore")
+    # For each available filter, check if the user has filtered something there
+    # If so, add them as a filter group
+    # AllTogether refers to the dimensions by their IDs, so the selected names are looked up in the dimension's table
+
+    # Venue names are not unique, as a journal and a conference may share a name. Therefore, they are filtered on the
+    # joined table Venue
+    f_1 = build_filter(venue, "v.Name", params)
+    f_2 = build_filter(research_area, "alto.ResearchAreaID", params, "ResearchArea")
+    f_3 = build_filter(country, "alto.CountryID", params, "Country")
+    f_4 = build_filter(cont, "alto.ContinentID", params, "Continent")
+    f_5 = f"({filter_str})" if filter_str else ""
+    f_6 = build_filter(publication_type, "alto.PublicationTypeID", params, "PublicationType")
+    f_7 = "v.NumOfPublications >= ?"
+    params.append(min_publication_count)
+
+    # Combine each filter group with an AND operation
+    return " AND ".join(f for f in [f_1, f_2, f_3, f_4, f_5, f_6, f_7] if f)
 
-    # Get all the available years that the user could have selected
-    # and check if some of them are not in the output data
-    #
-    # It is necessary to have every year, including these with 0 values
-    # inside of the list for further operation
-    available_years = list(range(st.session_state.min_max[0], st.session_state.min_max[1] + 1))
 
-    for i in available_years:
-        if i not in grouped_absolutes.index:
-            grouped_absolutes.loc[i] = {"Absolute": 0} # type: ignore
-        if i not in grouped_relatives.index:
-            grouped_relatives.loc[i] = {"Relative": 0} #type: ignore
+def build_query(venue, min_publication_count, country, cont, publication_type, author_position, research_area):
+    """
+    Build the query for populate_graph() on the table AllTogether.
+    :param venue:                   list of str, selected venues
+    :param min_publication_count:   int, minimum number of publications of a venue
+    :param country:                 list of str, selected countries
+    :param cont:                    list of str, selected continents
+    :param publication_type:        list of str, selected publication types
+    :param author_position:         str, selected author position and gender, e.g. "First author woman"
+    :param research_area:           list of str, selected research areas
+    :return:                        tuple of the query with the columns Year, Absolute and Relative and the list of
+                                    its parameters
+    """
+    _, sql_gender = AUTHOR_POSITION_FILTERS.get(author_position, ("", ""))
+
+    # Creates query
+    # The gender is the first parameter of the query, as it is used in the SELECT
+    params = [sql_gender, sql_gender]
+    newf = build_conditions(
+        venue, min_publication_count, country, cont, publication_type, author_position, research_area, params
+    )
+
+    # Without a selected venue, the unary + keeps SQLite from looking up the rows of AllTogether venue by venue, which is
+    # slower than scanning the rows matching the other filters
+    venue_join_column = "alto.VenueID" if venue else "+alto.VenueID"
+
+    # Basic SQL query structure
+
+    # The query creates a table with Year | Absolute | Relative columns
+    # It first counts all the Publications that match the WHERE conditions and where at least one woman is found
+    # The same is done for relative, but this also includes a calculation of the
+    # percentage where the publications with woman gender are divided by all the unique publications
+    sql_start = f"""SELECT 
+    alto.Year, 
+    COUNT(DISTINCT 
+        CASE 
+        WHEN alto.GenderID = (SELECT GenderID FROM Gender WHERE Name = ?) THEN alto.PublicationID 
+        END
+    ) AS Absolute, 
+    COUNT(DISTINCT 
+        CASE 
+        WHEN alto.GenderID = (SELECT GenderID FROM Gender WHERE Name = ?) THEN alto.PublicationID 
+        END
+    ) * 100.0 / COUNT(DISTINCT alto.PublicationID) AS Relative
+    FROM AllTogether alto
+    INNER JOIN Venue v ON v.VenueID = {venue_join_column}
+        """
+    sql_filter_start = """\nWHERE """
+    sql_end = """\nGROUP BY alto.Year;"""
 
-    return grouped_absolutes, grouped_relatives
+    return sql_start + sql_filter_start + newf + sql_end, params
+
+
+def build_cube_query(venue, min_publication_count, country, cont, publication_type, author_position, research_area):
+    """
+    Build the query for populate_graph() on the table GenderCube, which holds the distinct publication counts of
+    AllTogether per year, venue, publication type, research area, country, continent and class of author positions.
+    The counts of different countries and continents can not be summed up, because the authors of a publication may
+    come from several of them. Therefore, the cube can only answer selections of at most one country and one continent.
+    :param venue:                   list of str, selected venues
+    :param min_publication_count:   int, minimum number of publications of a venue
+    :param country:                 list of str, selected countries
+    :param cont:                    list of str, selected continents
+    :param publication_type:        list of str, selected publication types
+    :param author_position:         str, selected author position and gender, e.g. "First author woman"
+    :param research_area:           list of str, selected research areas
+    :return:                        tuple of the query with the columns Year, Absolute and Relative and the list of
+                                    its parameters, or None if the selection can not be answered from the cube
+    """
+    if len(country) > 1 or len(cont) > 1:
+        return None
+
+    position_class, _, gender = author_position.partition(" author ")
+    if position_class not in {"First", "Middle", "Last", "Any"} or gender not in {"woman", "man"}:
+        return None
+    count = "WomanCount" if gender == "woman" else "ManCount"
+
+    # The cube stores authors without a known country under the country and continent 'Unknown'
+    filters = ["PositionClass = ?"]
+    params = [position_class]
+    if country:
+        filters.append("Country = ?")
+        params.append(country[0])
+    else:
+        filters.append("Country IS NULL")
+    if cont:
+        filters.append("Continent = ?")
+        params.append(cont[0])
+    elif not country:
+        filters.append("Continent IS NULL")
+
+    # The cube stores venues by their IDs and all other dimensions by their names. Venue names are not unique, so all
+    # venues of a selected name are looked up, together with the minimum number of publications, so that the index of
+    # the cube is searched for the selected venues only. The cube holds no publications without a venue, so 'Unknown'
+    # venues match nothing
+    venue_filter = "VenueID IN (SELECT VenueID FROM Venue WHERE NumOfPublications >= ?)"
+    if venue:
+        placeholders = ", ".join("?" for item in venue if item != "Unknown")
+        venue_filter = (
+            f"VenueID IN (SELECT VenueID FROM Venue WHERE Name IN ({placeholders}) AND NumOfPublications >= ?)"
+        )
+        params.extend(item for item in venue if item != "Unknown")
+    params.append(min_publication_count)
+    filters.append(venue_filter)
+    for filter_list, field_name in ((research_area, "ResearchArea"), (publication_type, "PublicationType")):
+        if filter_list:
+            filters.append(build_filter(filter_list, field_name, params))
+
+    return (
+        f"""SELECT
+    Year,
+    SUM({count}) AS Absolute,
+    SUM({count}) * 100.0 / SUM(TotalCount) AS Relative
+    FROM GenderCube
+    WHERE {" AND ".join(filters)}
+    GROUP BY Year;""",
+        params,
+    )
+
+
+def build_graph_query(filter_key):
+    """
+    Build the query of a filter selection, on the pre-aggregated gender cube if the cube can answer the selection,
+    otherwise on AllTogether.
+    :param filter_key:  tuple, key of the filter selection built by normalize_filters() in query_cache.py
+    :return:            tuple of the query with the columns Year, Absolute and Relative and the list of its parameters
+    """
+    filters = {name: list(value) if isinstance(value, tuple) else value for name, value in filter_key}
+    return build_cube_query(**filters) or build_query(**filters)
+
+
+def build_batch_query(filter_keys):
+    """
+    Build a single query for several filter selections, which counts the publications of all selections in one pass
+    over the table AllTogether. Each row of AllTogether is joined to every selection it matches, and the rows are
+    grouped by selection and year.
+    :param filter_keys: list of tuples, keys of the filter selections built by normalize_filters() in query_cache.py
+    :return:            tuple of the query with the columns SeriesID, Year, Absolute and Relative, where SeriesID is the
+                        index of the selection in filter_keys, and the list of its parameters
+    """
+    selections = [
+        {name: list(value) if isinstance(value, tuple) else value for name, value in filter_key}
+        for filter_key in filter_keys
+    ]
+
+    # The series are a table of the index and the gender of each selection, the gender is the first parameter of each
+    params = []
+    series = []
+    conditions = []
+    for i, filters in enumerate(selections):
+        _, sql_gender = AUTHOR_POSITION_FILTERS.get(filters["author_position"], ("", ""))
+        series.append(f"({i}, (SELECT GenderID FROM Gender WHERE Name = ?))")
+        params.append(sql_gender)
+    for i, filters in enumerate(selections):
+        conditions.append(f"(s.SeriesID = {i} AND {build_conditions(**filters, params=params)})")
+
+    # Like in build_query(), the venues are only looked up by their IDs if a selection filters on them. The CROSS JOIN
+    # keeps SQLite from scanning AllTogether once per selection, as it makes the selections the innermost loop
+    venue_join_column = "alto.VenueID" if any(filters["venue"] for filters in selections) else "+alto.VenueID"
+    series_conditions = "\n        OR ".join(conditions)
+
+    sql_query = f"""WITH Series(SeriesID, GenderID) AS (VALUES {", ".join(series)})
+    SELECT
+    s.SeriesID,
+    alto.Year,
+    COUNT(DISTINCT
+        CASE
+        WHEN alto.GenderID = s.GenderID THEN alto.PublicationID
+        END
+    ) AS Absolute,
+    COUNT(DISTINCT
+        CASE
+        WHEN alto.GenderID = s.GenderID THEN alto.PublicationID
+        END
+    ) * 100.0 / COUNT(DISTINCT alto.PublicationID) AS Relative
+    FROM AllTogether alto
+    INNER JOIN Venue v ON v.VenueID = {venue_join_column}
+    CROSS JOIN Series s
+    WHERE {series_conditions}
+    GROUP BY s.SeriesID, alto.Year;"""
+    return sql_query, params
+
+
+def query_batch(filter_keys):
+    """
+    Get the results of several filter selections at once. The selections whose results are neither default graphs nor
+    in the query cache are answered by a single query, see build_batch_query(), and their results are added to the
+    query cache.
+    :param filter_keys: list of tuples, keys of the filter selections built by normalize_filters() in query_cache.py
+    :return:            list of pd.DataFrames with the columns Year, Absolute and Relative, one per filter selection
+    """
+    default_graphs = load_default_graphs()
+    outputs = [default_graphs.get(filter_key) for filter_key in filter_keys]
+    query_cache = get_query_cache()
+    for i, filter_key in enumerate(filter_keys):
+        if outputs[i] is None:
+            outputs[i] = query_cache.get(filter_key)
+    missing = [i for i, output in enumerate(outputs) if output is None]
+    if not missing:
+        return outputs
+
+    sql_query, params = build_batch_query([filter_keys[i] for i in missing])
+    with borrow_connection() as connection:
+        batch_output = pd.read_sql(sql_query, connection, params=params)
+
+    for series_id, output in batch_output.groupby("SeriesID"):
+        outputs[missing[series_id]] = output.drop("SeriesID", axis=1).reset_index(drop=True)
+    for i in missing:
+        # Selections without any matching publication have no rows
+        if outputs[i] is None:
+            outputs[i] = batch_output.drop("SeriesID", axis=1).iloc[0:0]
+        query_cache.put(filter_keys[i], outputs[i])
+    return outputs
+
+
+@st.cache_resource(show_spinner=False)
+def load_default_graphs():
+    """
+    Load the graphs shown on the first visit of a session, which database.py materialized into the table DefaultGraph.
+    The graphs are keyed by the minimum number of publications they were built for, so they only answer selections
+    of that minimum, whatever DEFAULT_GRAPH_MIN_PUBLICATION_COUNT is.
+    :return:    dict, mapping the key of each graph's filter selection to its data with the columns Year, Absolute and
+                Relative. Empty, if the database has no table DefaultGraph
+    """
+    with borrow_connection() as connection:
+        # Databases built before the shares were exact and the minimum was stored have no column MinPublicationCount,
+        # their default graphs are queried again
+        sql = """SELECT name FROM pragma_table_info('DefaultGraph') WHERE name = 'MinPublicationCount';"""
+        if not connection.execute(sql).fetchall():
+            return {}
+        default_graphs = pd.read_sql(
+            "SELECT Continent, MinPublicationCount, Year, Absolute, Relative FROM DefaultGraph;", connection
+        )
+
+    return {
+        normalize_filters(
+            [], min_publication_count, [], [continent], [], DEFAULT_GRAPH_AUTHOR_POSITION, []
+        ): output.drop(["Continent", "MinPublicationCount"], axis=1).reset_index(drop=True)
+        for (continent, min_publication_count), output in default_graphs.groupby(["Continent", "MinPublicationCount"])
+    }
+
+
+@st.cache_data(max_entries=1000, show_spinner=False)
+def query_and_process(filter_key):
+    # Take the result from the default graphs or the query cache on disk, which is shared by all sessions and kept
+    # across restarts. Otherwise, run the sql query and convert it to a pandas dataframe
+    output = load_default_graphs().get(filter_key)
+    if output is None:
+        query_cache = get_query_cache()
+        output = query_cache.get(filter_key)
+        if output is None:
+            sql_query, params = build_graph_query(filter_key)
+            with borrow_connection() as connection:
+                output = pd.read_sql(sql_query, connection, params=params)
+            query_cache.put(filter_key, output)
+
+    return densify_result(output, get_year_axis(*st.session_state.min_max))
+
+
+def densify_result(output, years):
+    """
+    Convert the result of a graph query into dense arrays over the year axis of the graphs.
+    :param output:  pd.DataFrame with the columns Year, Absolute and Relative, one row per year with publications
+    :param years:   pd.RangeIndex, the year axis of the graphs, see get_year_axis()
+    :return:        tuple of the absolute numbers (np.int32 array), the shares in percent (np.float32 array), both with
+                    0 for years without publications, and the total number of publications
+    """
+    # Set the Year as the index
+    # Remove 2024 from response as well, because the data is not relevant
+    output = output.set_index("Year").drop(2024, axis=0, errors="ignore")
+    total_absolutes = int(output["Absolute"].sum())
+
+    # It is necessary to have every year that the user could have selected,
+    # including these with 0 values, for further operation. Years without
+    # publications are missing in the output, so it is reindexed to the
+    # year axis of the graphs, which fills them with 0 in one step
+    output = output.reindex(years, fill_value=0)
+
+    return output["Absolute"].to_numpy(np.int32), output["Relative"].to_numpy(np.float32), total_absolutes
 
 
 # Determines the font color of the hover
@@ -560,87 +881,23 @@ def get_hover_font_color(bg_color):
 
 # Functionality for visualizing the collected data
 def paint_graph():
+    """
+    Build the figure with a trace per graph of the graph history. Interactions that do not add or remove graphs only
+    update the traces of this figure, see update_graph_data() and update_graph_visibility().
+    """
 
     # Set pandas graph processing to plotly library
     pd.options.plotting.backend = "plotly"
 
-    # Get only the dataframes that were
-    # selected in graph history
-    line_graph_data = get_selected_df()
-
-    # Filter the data by the year range, that the user wants
-    # to be displayed
-    line_graph_data = line_graph_data[
-        (line_graph_data["Year"] >= min(st.session_state.graph_years))
-        & (line_graph_data["Year"] <= max(st.session_state.graph_years))
-    ]
-    line_graph_data = line_graph_data.set_index("Year")
-
-    fig = go.Figure()
-
-    filtered_y_columns = [
-        y_column for y_column in st.session_state.y_columns
-        if y_column.isVisible
-    ]
-
-    data_column_names = list(line_graph_data.columns)
-
-    # Create the figure
-    fig = go.Figure()
-
-    for idx, column in enumerate(data_column_names):
-        if column in [y_column.name for y_column in st.session_state.y_columns]:
-            index = filtered_y_columns[idx]
-            value_title = (
-                "Count"
-                if st.session_state.widget_data_representation == "Absolute numbers"
-                else "Share of Publications"
-            )
-            # filters out zeros
-            filtered_data = [(x, y) for x, y in zip(line_graph_data.index, line_graph_data[column]) if y != 0]
-            # splits data into seperate lists
-            filtered_x = [x for x, y in filtered_data]
-            filtered_y = [y for x, y in filtered_data]
-            if(st.session_state.widget_data_representation == "Relative numbers"):
-                customdata = [
-                    f"{v}%" if (v == 0 or index.absoluteData[k] == 0) else
-                    f"{v}% ({index.absoluteData[k]}/{int(index.absoluteData[k] / (v / 100))})"# calculates %
-                    for k, v in index.relativeData.items()
-                    if st.session_state.graph_years[0] <= k <=
-                    st.session_state.graph_years[-1] and line_graph_data[column][k] != 0
-                ]
-            else:
-                customdata =[
-                    index.absoluteData[k]
-                    for k, v in index.relativeData.items()
-                    if st.session_state.graph_years[0] <= k <= st.session_state.graph_years[-1] and line_graph_data[column][k] != 0
-                ] 
-
-        else:
-            filtered_data = line_graph_data
-            filtered_x = line_graph_data.index
-            filtered_y = line_graph_data[column]
-            customdata = [
-                index.absoluteData[k]
-                for k, v in index.relativeData.items()
-                if st.session_state.graph_years[0] <= k <=
-                st.session_state.graph_years[-1]
-            ]
-
-            
-
-        fig.add_trace(
+    # Create the traces, they are added to the figure at once
+    traces = []
+    for y_column in st.session_state.y_columns:
+        traces.append(
             go.Scatter(
-                x=filtered_x,
-                y=filtered_y,
                 mode="lines",
-                name=column,
+                name=y_column.name,
                 line_shape="spline",
                 line_smoothing=0.7,
-                meta=[column, value_title],
-                # The list to display the value alongside with the absolute numbers
-                # if the selected data representation is "Relative numbers"
-                customdata=customdata,
                 hovertemplate=
                 # Plotly's hovertemplate uses %{...} syntax to access data from the plot's data
                 # and customdata attributes. To access the name of the index, we use %{meta[0]}.
@@ -651,15 +908,17 @@ def paint_graph():
                 # The bgcolor attribute sets the background color, and the font attribute sets
                 # the font properties.
                 hoverlabel=dict(
-                    bgcolor=index.color,
+                    bgcolor=y_column.color,
                     font=dict(
-                        color=get_hover_font_color(index.color),
+                        color=get_hover_font_color(y_column.color),
                     ),
-                ), 
-                marker=dict(color=filtered_y_columns[idx].color),
-
-                ))
+                ),
+                marker=dict(color=y_column.color),
+            )
+        )
 
+    # Create the figure
+    fig = go.Figure(data=traces)
     fig.update_layout(
         font_size=13,
         legend_title="Filters (click to toggle on/off)",
@@ -676,10 +935,7 @@ def paint_graph():
     fig.update_xaxes(tickformat="d")
     fig.update_yaxes(automargin=True, rangemode="tozero")
 
-    if st.session_state.widget_data_representation == "Relative numbers":
-        fig.update_layout(yaxis_title="Share of Publications", yaxis_ticksuffix="%")
-    else:
-        fig.update_layout(yaxis_title="Number of Publications")
+    update_graph_data(fig)
 
     # Update the session state graph
     # -> Because of this update, it will
@@ -687,46 +943,124 @@ def paint_graph():
     st.session_state.graph = fig
 
 
-# Get all the graphs that the user selected in "Graph History"
-def get_selected_df(): 
-    true_df = pd.DataFrame()
+def update_graph_data(fig=None):
+    """
+    Update the data of the traces to the selected year range and data representation, without building a new figure.
+    :param fig: go.Figure, the figure built by paint_graph(). Defaults to the figure of the session
+    """
+    fig = fig or st.session_state.graph
+    if fig is None:
+        return
 
-    # Go through every possible dataframe
-    for i in range(len(st.session_state.y_columns)):
+    # Get the data of all graphs of the graph history,
+    # as matrices of years x graphs.
+    # Filter the data by the year range, that the user wants
+    # to be displayed
+    absolute_data, relative_data = get_selected_df(st.session_state.y_columns)
+    in_year_range = (absolute_data.index >= min(st.session_state.graph_years)) & (
+        absolute_data.index <= max(st.session_state.graph_years)
+    )
+    absolute_data = absolute_data[in_year_range]
+    relative_data = relative_data[in_year_range]
 
-        # If the user has selected the graph in Graph history,
-        # Do further operations for displaying it
-        if st.session_state.y_columns[i].isVisible is True:
+    value_title = (
+        "Count"
+        if st.session_state.widget_data_representation == "Absolute numbers"
+        else "Share of Publications"
+    )
+    if st.session_state.widget_data_representation == "Relative numbers":
+        line_graph_data = relative_data
+        # The value alongside with the absolute numbers, e.g. "25% (10/40)", for all graphs and years at once
+        customdata = relative_data.round(2).applymap("{:g}%".format)
+        with_absolutes = (relative_data != 0) & (absolute_data != 0)
+        # The shares are stored as float32, they are widened so that the totals are recovered exactly
+        totals = (absolute_data / (relative_data.astype("float64") / 100))[with_absolutes].fillna(0).round().astype(int)
+        customdata = customdata.mask(
+            with_absolutes, customdata + " (" + absolute_data.astype(str) + "/" + totals.astype(str) + ")"
+        )
+    else:
+        line_graph_data = absolute_data
+        customdata = absolute_data
+
+    # Years with a value of 0 are not drawn. The graphs are sliced out of the matrices as numpy arrays
+    years = line_graph_data.index.to_numpy()
+    values = line_graph_data.to_numpy()
+    customdata = customdata.to_numpy()
+    non_zero = values != 0
+    column_indices = {column: idx for idx, column in enumerate(line_graph_data.columns)}
+    visible = {y_column.name: y_column.isVisible for y_column in st.session_state.y_columns}
+
+    with fig.batch_update():
+        for trace in fig.data:
+            idx = column_indices[trace.name]
+            trace.update(
+                x=years[non_zero[:, idx]],
+                y=values[non_zero[:, idx], idx],
+                meta=[trace.name, value_title],
+                # The list to display the value alongside with the absolute numbers
+                # if the selected data representation is "Relative numbers"
+                customdata=customdata[non_zero[:, idx], idx],
+                visible=visible[trace.name],
+            )
 
-            # Access the different stored values.
-            # If Absolute numbers is selected, get the data for absolute numbers
-            # and the same for relative numbers
-            if st.session_state.widget_data_representation == "Absolute numbers":
-                true_df.insert(
-                    loc=len(true_df.columns),
-                    column=st.session_state.y_columns[i].name,
-                    value=pd.Series(list(st.session_state.y_columns[i].absoluteData.values())),
-                )
-            else:
-                true_df.insert(
-                    loc=len(true_df.columns),
-                    column=st.session_state.y_columns[i].name,
-                    value=pd.Series(list(st.session_state.y_columns[i].relativeData.values())),
-                )
+        if st.session_state.widget_data_representation == "Relative numbers":
+            fig.update_layout(yaxis_title="Share of Publications", yaxis_ticksuffix="%")
+        else:
+            fig.update_layout(yaxis_title="Number of Publications", yaxis_ticksuffix=None)
 
-    # Insert year column
-    #
+
+def update_graph_visibility():
+    """
+    Show only the traces of the graphs that the user selected in "Graph History", without building a new figure.
+    """
+    if st.session_state.graph is None:
+        return
+
+    visible = {y_column.name: y_column.isVisible for y_column in st.session_state.y_columns}
+    with st.session_state.graph.batch_update():
+        for trace in st.session_state.graph.data:
+            trace.visible = visible[trace.name]
+
+
+def has_visible_graph():
+    """
+    Check whether the figure shows any graph, i.e. a graph exists and is selected in "Graph History".
+    :return:    bool
+    """
+    graph = st.session_state.get("graph")
+    return graph is not None and any(trace.visible for trace in graph.data)
+
+
+# Get the data of the graphs, e.g. the ones of "Graph History"
+def get_selected_df(y_columns):
+    """
+    Get the data of the given graphs.
+    :param y_columns:   list of GraphData
+    :return:            tuple of pd.DataFrames, the absolute and the relative numbers as matrices with a row per year
+                        and a column per graph
+    """
     # There will be enough values for every filter for sure,
     # because missing values from the original query were filled
-    # with 0 in previous steps
-    true_df.insert(
-        loc=0,
-        column="Year",
-        value=pd.Series(list(
-            range(st.session_state.min_max[0], st.session_state.min_max[1] + 1),
-        )),
+    # with 0 in previous steps. The graphs share their year axis,
+    # so pandas does not need to align them
+    absolute_data = pd.DataFrame(
+        {y_column.name: pd.Series(y_column.absoluteData, index=y_column.years) for y_column in y_columns}
     )
-    return true_df
+    relative_data = pd.DataFrame(
+        {y_column.name: pd.Series(y_column.relativeData, index=y_column.years) for y_column in y_columns}
+    )
+    return absolute_data, relative_data
+
+
+@st.cache_resource(show_spinner=False)
+def get_year_axis(first_year, last_year):
+    """
+    Get the year axis of the graphs, which is shared by all graphs of all sessions.
+    :param first_year:  int, first year of the data, see the session state min_max
+    :param last_year:   int, last year of the data
+    :return:            pd.RangeIndex
+    """
+    return pd.RangeIndex(first_year, last_year + 1, name="Year")
 
 
 # Display the checkboxes for the Graph history with the logic of selecting/unselecting the checkboxes
@@ -765,5 +1099,5 @@ def change_graph_checkbox(i):
         st.session_state.y_columns[i].isVisible = False
 
     # After a checkbox has been changed,
-    # Automatically repaint the graph
-    paint_graph()
+    # Automatically show or hide the graph
+    update_graph_visibility()
@@ -1,19 +1,27 @@
-from sqlite3 import connect
-
+import numpy as np
 import pandas as pd
 import streamlit as st
 from PIL import Image
-import requests
 
 import general_statistics as gs
 import graph_logic as gl
+from activity_log_client import log_event
+from connection_pool import get_connection_pool, borrow_connection
 
 class GraphData:
-    def __init__(self, name, isVisible, absoluteData, relativeData, color):
+    """
+    A graph of the graph history. Its numbers are arrays over the year axis, which is shared by all graphs, see
+    gl.get_year_axis(). Every session keeps all of its graphs, so they are stored compactly.
+    """
+
+    __slots__ = ("name", "isVisible", "years", "absoluteData", "relativeData", "color")
+
+    def __init__(self, name, isVisible, years, absoluteData, relativeData, color):
         self.name = name
         self.isVisible = isVisible
-        self.absoluteData = absoluteData
-        self.relativeData = relativeData
+        self.years = years
+        self.absoluteData = np.asarray(absoluteData, dtype=np.int32)
+        self.relativeData = np.asarray(relativeData, dtype=np.float32)
         self.color = color
 
 
@@ -33,14 +41,9 @@ def main():
         "The GAP-Tool allows users to explore the gender diversity in computer science publications. By choosing different venues, countries, research areas, one can highlight differences within the community.  \n  *Please note*: The gender-data used by this tool are based on GenderAPI, which automatically classifies authors based on their first names. Thus, we distinguish only female and male gender and cannot reflect the full gender spectrum. Further, country information is based on the currently known affiliation from DBLP. It does not reflect the nationality of the author nor necessarily the affiliation of the author at the time of publication."
     )
 
-    # Connect to SQLite database
+    # Get the pool of SQLite connections shared by all sessions
     with st.spinner("Opening datasbase connection (This can take a while)..."):
-        if "connection" not in st.session_state:
-            st.session_state.connection = connect("gap.db", check_same_thread=False)
-
-        # Create cursor object
-        if "cursor" not in st.session_state:
-            st.session_state.cursor = st.session_state.connection.cursor()
+        get_connection_pool()
 
     # Initialize all the necessary session states
     with st.spinner("Initializing..."):
@@ -64,17 +67,15 @@ def main():
         st.session_state.setdefault("grouped_absolutes", {})
 
         if st.session_state.is_first_run:
-            try:
-                requests.get('http://localhost:6502/log_visitor')
-            except requests.exceptions.RequestException as e:
-                print(f"Error logging visitor: {e}")
+            # Queued and sent by a background thread, so the page never waits for the activity logger
+            log_event("visitor")
 
         # Get all the filters out of the pre-calculated filter csv files
         with st.spinner("Loading filters..."):
             gl.display_filters()
 
     # If there is no graph created yet, display a placeholder
-    if "graph" not in st.session_state or st.session_state.graph == None or not st.session_state.graph.data:
+    if not gl.has_visible_graph():
 
         st.markdown(
             "<h5 style='text-align: center;'>You have not selected any graphs yet </h5>",
@@ -110,11 +111,11 @@ def main():
             min_value=st.session_state.min_max[0],
             max_value=st.session_state.min_max[1],
             key="year_range",
-            on_change=gl.update_year_range(),
+            on_change=gl.update_year_range,
         )
         if widget_data_representation != st.session_state.widget_data_representation:
             st.session_state.widget_data_representation = widget_data_representation
-            gl.paint_graph()
+            gl.update_graph_data()
 
         # Show the chart
         # Because it is connected to session state, it will automatically update
@@ -125,7 +126,7 @@ def main():
     gl.display_graph_checkboxes()
 
     # Display statistics
-    gs.display_general_statistics(st.session_state.cursor)
+    gs.display_general_statistics()
 
     display_footer()
 
@@ -176,14 +177,14 @@ def main():
 
 
 def query_action(sql, action="run"):
-    # global cursor
-    # Executing the query
-    st.session_state.cursor.execute(sql)
+    # Executing the query on a connection borrowed from the pool
+    with borrow_connection() as connection:
+        cursor = connection.execute(sql)
+        # Fetching rows from the result table
+        result = cursor.fetchall()
 
     if action != "run":
         store = {}
-        # Fetching rows from the result table
-        result = st.session_state.cursor.fetchall()
         if action == "check":
             return result
         for row in result:
@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+import time
+from sqlite3 import connect
+
+import pandas as pd
+import streamlit as st
+
+from connection_pool import get_build_date
+from utils import log
+
+QUERY_CACHE_DB = os.environ.get("QUERY_CACHE_DB", "query_cache.db")
+# Number of query results kept on disk, the least recently used ones are evicted first
+MAX_ENTRIES = 10000
+# Version of the format of the query results. Increase it whenever the queries change their results, so that the
+# results cached before are cleared like those of a previous database build
+RESULT_FORMAT = 2
+
+
+def normalize_filters(venue, min_publication_count, country, cont, publication_type, author_position, research_area):
+    """
+    Build the canonical key of a filter selection, so that selections of the same values in a different order or with
+    duplicates share a key. The parameters are the ones of populate_graph() in graph_logic.py.
+    :return:    tuple of (parameter name, value) pairs, the selected values sorted and deduplicated
+    """
+    return (
+        ("venue", tuple(sorted(set(venue)))),
+        ("min_publication_count", int(min_publication_count)),
+        ("country", tuple(sorted(set(country)))),
+        ("cont", tuple(sorted(set(cont)))),
+        ("publication_type", tuple(sorted(set(publication_type)))),
+        ("author_position", author_position),
+        ("research_area", tuple(sorted(set(research_area)))),
+    )
+
+
+class QueryCache:
+    """
+    Persistent cache of query results in a SQLite database, shared by all sessions and kept across restarts of the
+    app. The results are only valid for the build of gap.db they were queried from, so the cache is cleared if the
+    'Date' of the table GeneralStatistics differs from the one the results were cached for. The same applies to a new
+    RESULT_FORMAT.
+    """
+
+    def __init__(self, path, build_date, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        # Sessions run in different threads, so access to the connection is serialized by the lock
+        self._connection = connect(path, timeout=30, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode = WAL;")
+            self._connection.execute("CREATE TABLE IF NOT EXISTS Build(Date TEXT);")
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS QueryResult(
+                    FilterKey TEXT NOT NULL PRIMARY KEY,
+                    Result TEXT NOT NULL,
+                    LastUsed REAL NOT NULL);"""
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS query_result_last_used_index ON QueryResult(LastUsed);"
+            )
+            if self._connection.execute("SELECT Date FROM Build;").fetchall() != [(build_date,)]:
+                log(f"Clearing the query cache for the database build of {build_date}")
+                self._connection.execute("DELETE FROM QueryResult;")
+                self._connection.execute("DELETE FROM Build;")
+                self._connection.execute("INSERT INTO Build VALUES(?);", (build_date,))
+
+    def get(self, filter_key):
+        """
+        Get the cached result of a filter selection and mark it as recently used.
+        :param filter_key:  tuple, key of the filter selection built by normalize_filters()
+        :return:            pd.DataFrame, or None if the result is not cached
+        """
+        key = json.dumps(filter_key)
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT Result FROM QueryResult WHERE FilterKey = ?;", (key,)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE QueryResult SET LastUsed = ? WHERE FilterKey = ?;", (time.time(), key))
+        return pd.DataFrame(json.loads(row[0]))
+
+    def put(self, filter_key, result):
+        """
+        Cache the result of a filter selection and evict the least recently used results beyond max_entries.
+        :param filter_key:  tuple, key of the filter selection built by normalize_filters()
+        :param result:      pd.DataFrame, the result of the query
+        """
+        key = json.dumps(filter_key)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO QueryResult VALUES(?, ?, ?);",
+                (key, json.dumps(result.to_dict("list")), time.time()),
+            )
+            self._connection.execute(
+                """DELETE FROM QueryResult WHERE FilterKey IN (
+                    SELECT FilterKey FROM QueryResult ORDER BY LastUsed DESC LIMIT -1 OFFSET ?);""",
+                (self.max_entries,),
+            )
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_cache():
+    """
+    Get the query cache shared by all sessions of the app process.
+    :return:    QueryCache
+    """
+    return QueryCache(QUERY_CACHE_DB, f"{get_build_date()} (format {RESULT_FORMAT})", MAX_ENTRIES)
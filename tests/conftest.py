@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The modules of the app are not a package, streamlit imports them from the root of the repository
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
@@ -0,0 +1,302 @@
+import random
+import re
+from sqlite3 import connect
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import graph_logic as gl
+import prototype as pt
+from conftest import ROOT
+from query_cache import normalize_filters
+
+FIRST_YEAR = 2000
+LAST_YEAR = 2022
+YEARS = pd.RangeIndex(FIRST_YEAR, LAST_YEAR + 1, name="Year")
+# Years without any publication in the fixture database, which the results have to be filled with 0 for
+EMPTY_YEARS = {2003, 2010, 2011}
+CONTINENTS = ["Europe", "Asia"]
+COUNTRIES = {"Germany": "Europe", "France": "Europe", "Japan": "Asia"}
+GENDERS = ["woman", "man", "unknown"]
+
+
+class SessionState(dict):
+    __getattr__ = dict.__getitem__
+    __setattr__ = dict.__setitem__
+
+
+def loc_zero_fill(output, min_max):
+    """
+    The zero-filling of query_and_process() before the results were reindexed, which appended each missing year.
+    """
+    grouped_absolutes = output.drop("Relative", axis=1).set_index("Year").drop(2024, axis=0, errors="ignore")
+    grouped_relatives = output.drop("Absolute", axis=1).set_index("Year").drop(2024, axis=0, errors="ignore")
+    for i in range(min_max[0], min_max[1] + 1):
+        if i not in grouped_absolutes.index:
+            grouped_absolutes.loc[i] = {"Absolute": 0}
+        if i not in grouped_relatives.index:
+            grouped_relatives.loc[i] = {"Relative": 0}
+    return grouped_absolutes, grouped_relatives
+
+
+@pytest.mark.parametrize(
+    "output",
+    [
+        # Missing years, a row of 2024 and a row of the year after the axis, which the app does not show
+        pd.DataFrame(
+            {
+                "Year": [2000, 2001, 2005, 2020, 2023, 2024],
+                "Absolute": [3, 1, 7, 12, 5, 9],
+                "Relative": [30.0, 100 / 3, 70.0, 12 * 100.0 / 7000, 50.0, 90.0],
+            }
+        ),
+        # Every year of the axis
+        pd.DataFrame({"Year": list(YEARS), "Absolute": list(range(len(YEARS))), "Relative": [50.0] * len(YEARS)}),
+        # Only 2024
+        pd.DataFrame({"Year": [2024], "Absolute": [4], "Relative": [40.0]}),
+    ],
+)
+def test_reindex_matches_loc_zero_fill(output):
+    absolutes, relatives, total = gl.densify_result(output.copy(), YEARS)
+    grouped_absolutes, grouped_relatives = loc_zero_fill(output.copy(), (FIRST_YEAR, LAST_YEAR))
+
+    assert absolutes.dtype == np.int32 and relatives.dtype == np.float32
+    assert len(absolutes) == len(relatives) == len(YEARS)
+    # The graphs were aligned to the year axis before, see get_selected_df()
+    np.testing.assert_array_equal(absolutes, grouped_absolutes.sort_index()["Absolute"].reindex(YEARS))
+    np.testing.assert_array_equal(
+        relatives, grouped_relatives.sort_index()["Relative"].reindex(YEARS).astype(np.float32)
+    )
+    assert total == sum(grouped_absolutes["Absolute"])
+
+
+@pytest.fixture(scope="module")
+def connection():
+    """
+    A small database with the schema of AllTogether and its dimensions, including GenderCube and DefaultGraph.
+    """
+    # database.py reads its general data relative to the root of the repository on import
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(ROOT)
+        import database
+
+    connection = connect(":memory:")
+    connection.executescript(
+        """
+        CREATE TABLE Gender(GenderID INT, Name TEXT);
+        CREATE TABLE Venue(VenueID INT, Name TEXT, NumOfPublications INT);
+        CREATE TABLE PublicationType(PublicationTypeID INT, Name TEXT);
+        CREATE TABLE ResearchArea(ResearchAreaID INT, Name TEXT);
+        CREATE TABLE Country(CountryID INT, DisplayName TEXT);
+        CREATE TABLE Continent(ContinentID INT, Name TEXT);
+        CREATE TABLE AllTogether(
+            PublicationID TEXT,
+            PublicationTypeID INT,
+            AuthorID TEXT,
+            VenueID INT,
+            AffiliationID INT,
+            Position INT,
+            GenderID INT,
+            Year INT,
+            AuthorCount INT,
+            CountryID INT,
+            ContinentID INT,
+            ResearchAreaID INT);
+        """
+    )
+    connection.executemany("INSERT INTO Gender VALUES(?, ?);", enumerate(GENDERS, 1))
+    connection.executemany("INSERT INTO Venue VALUES(?, ?, ?);", [(1, "VLDB", 300), (2, "SIGMOD", 200), (3, "X", 2)])
+    connection.executemany("INSERT INTO PublicationType VALUES(?, ?);", [(1, "Conference"), (2, "Journal")])
+    connection.executemany("INSERT INTO ResearchArea VALUES(?, ?);", [(1, "Databases")])
+    connection.executemany("INSERT INTO Country VALUES(?, ?);", enumerate(COUNTRIES, 1))
+    connection.executemany("INSERT INTO Continent VALUES(?, ?);", enumerate(CONTINENTS, 1))
+
+    rng = random.Random(24)
+    rows = []
+    years = [year for year in range(FIRST_YEAR, LAST_YEAR + 3) if year not in EMPTY_YEARS]
+    for publication in range(1500):
+        year = rng.choice(years)
+        author_count = rng.randint(1, 4)
+        venue = rng.randint(1, 3)
+        publication_type = rng.randint(1, 2)
+        research_area = rng.choice([None, 1])
+        for position in range(1, author_count + 1):
+            country = rng.choice([None, *range(1, len(COUNTRIES) + 1)])
+            continent = None if country is None else CONTINENTS.index(list(COUNTRIES.values())[country - 1]) + 1
+            rows.append(
+                (
+                    f"p{publication}",
+                    publication_type,
+                    f"a{rng.randint(0, 400)}",
+                    venue,
+                    None,
+                    position,
+                    rng.choice([None, 1, 2, 3]),
+                    year,
+                    author_count,
+                    country,
+                    continent,
+                    research_area,
+                )
+            )
+    connection.executemany(f"INSERT INTO AllTogether VALUES({', '.join('?' * 12)});", rows)
+    database.fill_gender_cube(connection)
+    database.fill_default_graphs(connection)
+    yield connection
+    connection.close()
+
+
+def expected_counts(connection, cont, author_position, min_publication_count):
+    """
+    Count the publications of a selection with pandas instead of SQL.
+    :return:    tuple of pd.Series of the absolute numbers and of the total numbers of publications per year
+    """
+    rows = pd.read_sql(
+        """SELECT PublicationID, Position, AuthorCount, Year, NumOfPublications, Continent.Name AS Continent,
+        Gender.Name AS Gender
+        FROM AllTogether
+        INNER JOIN Venue ON Venue.VenueID = AllTogether.VenueID
+        LEFT JOIN Continent ON Continent.ContinentID = AllTogether.ContinentID
+        LEFT JOIN Gender ON Gender.GenderID = AllTogether.GenderID;""",
+        connection,
+    )
+    position_class, _, gender = author_position.partition(" author ")
+    positions = {
+        "First": rows["Position"] == 1,
+        "Middle": (rows["Position"] > 1) & (rows["Position"] < rows["AuthorCount"]),
+        "Last": rows["Position"] == rows["AuthorCount"],
+        "Any": rows["Position"] > 0,
+    }
+    selected = rows[
+        positions[position_class]
+        & (rows["NumOfPublications"] >= min_publication_count)
+        & (rows["Continent"].isin(cont) if cont else True)
+    ]
+    totals = selected.groupby("Year")["PublicationID"].nunique()
+    absolutes = selected[selected["Gender"] == gender].groupby("Year")["PublicationID"].nunique()
+    return absolutes.reindex(totals.index, fill_value=0), totals
+
+
+SELECTIONS = [
+    (["Europe"], "First author woman", 0),
+    (["Asia"], "Last author man", 100),
+    ([], "Any author woman", 0),
+    ([], "Middle author man", 0),
+]
+
+
+@pytest.mark.parametrize("source", ["AllTogether", "GenderCube", "DefaultGraph"])
+@pytest.mark.parametrize("cont, author_position, min_publication_count", SELECTIONS)
+def test_shares_are_exact(connection, source, cont, author_position, min_publication_count):
+    filters = dict(
+        venue=[],
+        min_publication_count=min_publication_count,
+        country=[],
+        cont=cont,
+        publication_type=[],
+        author_position=author_position,
+        research_area=[],
+    )
+    if source == "DefaultGraph":
+        if (author_position, min_publication_count, len(cont)) != ("First author woman", 0, 1):
+            pytest.skip("DefaultGraph only holds the graphs of the continents shown on the first visit")
+        output = pd.read_sql(
+            "SELECT Year, Absolute, Relative FROM DefaultGraph WHERE Continent = ?;", connection, params=cont
+        )
+    else:
+        build = gl.build_query if source == "AllTogether" else gl.build_cube_query
+        sql_query, params = build(**filters)
+        output = pd.read_sql(sql_query, connection, params=params)
+
+    absolutes, totals = expected_counts(connection, cont, author_position, min_publication_count)
+    output = output.set_index("Year")
+    assert list(output.index) == list(totals.index)
+    assert not EMPTY_YEARS & set(output.index)
+    np.testing.assert_array_equal(output["Absolute"], absolutes)
+    # The shares are computed in floating point by SQLite, the same way as here
+    assert list(output["Relative"]) == list(absolutes * 100.0 / totals)
+
+    dense_absolutes, dense_relatives, total = gl.densify_result(output.reset_index(), YEARS)
+    expected_relatives = (absolutes * 100.0 / totals).reindex(YEARS, fill_value=0).astype(np.float32)
+    np.testing.assert_array_equal(dense_relatives, expected_relatives)
+    np.testing.assert_array_equal(dense_absolutes, absolutes.reindex(YEARS, fill_value=0))
+    assert total == absolutes.drop(2024, errors="ignore").sum()
+
+
+@pytest.mark.parametrize(
+    "venue, country, cont",
+    [
+        (["VLDB"], [], []),
+        (["VLDB", "SIGMOD", "Unknown"], [], ["Europe"]),
+        (["SIGMOD"], ["Japan"], []),
+        (["Unknown"], [], []),
+    ],
+)
+def test_cube_searches_selected_venues(connection, venue, country, cont):
+    filters = dict(
+        venue=venue,
+        min_publication_count=100,
+        country=country,
+        cont=cont,
+        publication_type=[],
+        author_position="Any author woman",
+        research_area=[],
+    )
+    sql_query, params = gl.build_cube_query(**filters)
+    plan = [row[-1] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql_query}", params)]
+    assert [step for step in plan if step.startswith("SEARCH GenderCube") and "VenueID=?)" in step]
+
+    output = pd.read_sql(sql_query, connection, params=params)
+    sql_query, params = gl.build_query(**filters)
+    expected = pd.read_sql(sql_query, connection, params=params)
+    pd.testing.assert_frame_equal(output, expected, check_dtype=not expected.empty, check_index_type=False)
+
+
+def test_totals_recovered_from_shares(monkeypatch):
+    # Shares of these publication counts are not recovered by truncating, e.g. 5 of 6 publications yields 5.999999
+    pairs = [(5, 6), (3, 7), (5, 7), (6, 7), (5, 9), (1, 3), (2, 3), (997, 2999), (1, 1)]
+    years = pd.RangeIndex(FIRST_YEAR, FIRST_YEAR + len(pairs), name="Year")
+    absolutes = np.array([absolute for absolute, _ in pairs])
+    totals = np.array([total for _, total in pairs])
+    graph = pt.GraphData("Graph", True, years, absolutes, absolutes * 100.0 / totals, "#b1073b")
+    monkeypatch.setattr(
+        gl.st,
+        "session_state",
+        SessionState(
+            y_columns=[graph],
+            min_max=(years[0], years[-1]),
+            graph_years=list(years),
+            widget_data_representation="Relative numbers",
+            graph=None,
+        ),
+    )
+
+    gl.paint_graph()
+
+    customdata = gl.st.session_state.graph.data[0].customdata
+    assert [tuple(map(int, re.search(r"\((\d+)/(\d+)\)", text).groups())) for text in customdata] == pairs
+
+
+def test_batch_matches_separate_queries(connection):
+    filter_keys = [
+        normalize_filters([], 0, [], [continent], [], "First author woman", []) for continent in [*CONTINENTS, "Africa"]
+    ] + [
+        normalize_filters(["VLDB", "Unknown"], 0, [], [], ["Journal"], "Last author man", []),
+        normalize_filters([], 100, ["Germany", "Japan"], [], [], "Middle author woman", ["Databases", "Unknown"]),
+        normalize_filters([], 0, ["Unknown"], [], [], "Any author man", []),
+    ]
+
+    sql_query, params = gl.build_batch_query(filter_keys)
+    batch_output = pd.read_sql(sql_query, connection, params=params)
+    # The publications of all selections are counted in one pass over AllTogether
+    plan = [row[-1] for row in connection.execute(f"EXPLAIN QUERY PLAN {sql_query}", params)]
+    assert [step for step in plan if step.split(" ")[1:2] in (["alto"], ["s"])] == ["SCAN alto", "SCAN s"]
+
+    for i, filter_key in enumerate(filter_keys):
+        filters = {name: list(value) if isinstance(value, tuple) else value for name, value in filter_key}
+        sql_query, params = gl.build_query(**filters)
+        expected = pd.read_sql(sql_query, connection, params=params)
+        output = batch_output[batch_output["SeriesID"] == i].drop("SeriesID", axis=1).reset_index(drop=True)
+        # Selections without any matching publication have no rows, of which pandas can not infer the types
+        pd.testing.assert_frame_equal(output, expected, check_dtype=not expected.empty, check_index_type=False)